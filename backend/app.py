@@ -1,22 +1,40 @@
-from flask import Flask, request, jsonify, send_file        # Flask framework and utilities for web app and API handling
+import time                                                 # Startup timing (time-to-listening vs time-to-ready)
+STARTED_AT = time.monotonic()
+
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context  # Flask framework and utilities for web app and API handling
 from flask_cors import CORS                                # Enable Cross-Origin Resource Sharing (CORS) for API access from other domains
-from faster_whisper import WhisperModel                    # Faster-Whisper model for fast CPU-based speech-to-text
-import tempfile                                             # Create and manage temporary files (e.g., uploaded audio)
+from flask_sock import Sock                                 # WebSocket support for the streaming transcription endpoint
+from transcription import TranscriptionScheduler, RemoteScheduler, QueueFullError, TranscriptionTimeout  # Whisper worker pool with backpressure
+from audio import SAMPLE_RATE, decode_audio                              # In-memory decoding of uploaded audio into Whisper-ready samples
+from streaming import StreamDecoder, StreamingTranscriber, SentenceSplitter  # Incremental transcription; sentence-level reply streaming
+from speech_gate import speech_gate_from_env, PASS         # Reject silent clips and trim silence before Whisper
+from intent_matcher import IntentMatcher, KNOWN_SITES                   # Local rules/n-gram matcher that skips the LLM for common commands
+from tool_registry import ToolRegistry                      # Declare-once tools: schema, validation and dispatch generated at import
+from intent_cache import IntentCache                        # LRU/TTL cache of AI intent decisions
+from sessions import SessionStore, estimate_tokens                           # Bounded per-session conversation history
+from tool_executor import ToolExecutor                      # Concurrent tool calls with per-tool timeouts
+import metrics                                              # Per-request timing spans, JSON request logs and /metrics
+from metrics import span, tool_span
+import tempfile                                             # Default location of the TTS audio store
 import os                                                   # Interact with the operating system (file paths, environment variables)
 import datetime                                             # Handle dates and times for logging, timestamps, file naming
-import wikipedia                                           # Fetch summaries or pages from Wikipedia
+import base64                                               # Inline audio chunks in the streaming response
+from collections import deque                               # Ordered queue of sentences waiting for TTS
+from knowledge import knowledge_from_env                   # Cached Wikipedia (or offline fixture) lookups
 import pyjokes                                              # Generate random jokes (programming/general)
 import webbrowser                                           # Open URLs in the default web browser
 import platform                                             # Get system/platform information (OS, version, architecture)
 import subprocess                                          # Run external commands or programs
-import pyautogui                                            # Automate keyboard/mouse actions and take screenshots
 import json                                                 # Parse and generate JSON data
-import inspect                                              # Introspection for examining functions, classes, objects
-import pyttsx3                                              # Text-to-speech library for making the assistant speak
-from openai import OpenAI                                   # Access OpenAI APIs for GPT models, embeddings, etc.
+from tts import TTSWorker                                    # Persistent text-to-speech engine returning in-memory WAV bytes
+from audio_store import AudioStore                          # Content-addressed, size/age-bounded store of TTS replies
 from dotenv import load_dotenv
 
 #  CONFIGURATION 
+# Heavy modules (faster-whisper, pyautogui, pyttsx3, wikipedia, openai) are imported where they are
+# first used, so the server can start listening right away while the model loads in the background.
+
+load_dotenv()  # loads .env into environment
 
 # Initialize the Flask web application
 app = Flask(__name__)
@@ -25,24 +43,57 @@ app = Flask(__name__)
 # (which might be on a different port/domain) to communicate with this backend.
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-print("Loading Faster-Whisper model (CPU, INT8)...")
-# 2. Load the Whisper "base" model onto the CPU.
-model = WhisperModel(
-    "base",
-    device="cpu",
-    compute_type="int8",
-    cpu_threads=os.cpu_count()
-)
-print("Faster-Whisper loaded successfully.")
+# WebSocket extension used by /voice/stream
+sock = Sock(app)
 
-load_dotenv()  # loads .env into environment
+# Seconds from process start until we could accept connections / until the model was warm.
+STARTUP_TIMES = {"listening": None, "ready": None}
+
+def mark_listening():
+    if STARTUP_TIMES["listening"] is None:
+        STARTUP_TIMES["listening"] = round(time.monotonic() - STARTED_AT, 3)
+        print(f"[LOG] Time to listening: {STARTUP_TIMES['listening']}s")
+
+def mark_ready():
+    STARTUP_TIMES["ready"] = round(time.monotonic() - STARTED_AT, 3)
+    print(f"[LOG] Faster-Whisper loaded and warmed up ({scheduler.replicas} replicas x {scheduler.cpu_threads} threads). "
+          f"Time to ready: {STARTUP_TIMES['ready']}s")
+
+# 2. Load the Whisper "base" model onto the CPU behind a scheduler.
+# Replica count, threads per replica, queue size and job timeout come from
+# WHISPER_REPLICAS / WHISPER_CPU_THREADS / WHISPER_QUEUE_SIZE / WHISPER_JOB_TIMEOUT.
+# By default it loads (and runs a warm-up transcription) in the background; /readyz reports when it's done.
+# WHISPER_EAGER_LOAD=1 restores the old behaviour of loading before anything else happens.
+# Under serve.py the model lives in a separate model server process (WHISPER_SERVER is its socket),
+# shared by all the forked web workers.
+if os.getenv("WHISPER_SERVER"):
+    scheduler = RemoteScheduler(os.getenv("WHISPER_SERVER"))
+else:
+    scheduler = TranscriptionScheduler("base")
+print("Loading Faster-Whisper model (CPU, INT8)...")
+if os.getenv("WHISPER_EAGER_LOAD") == "1":
+    scheduler.start()
+    mark_ready()
+else:
+    scheduler.start_background(on_ready=mark_ready)
 
 #  SETUP GROQ CLIENT 
 # Initialize the OpenAI client but point it to Groq's API endpoint.
 # Groq provides very fast inference for open-source models like Llama 3.
 # Note: API keys should ideally be stored in environment variables for security.
+# LLM_BASE_URL points at any other OpenAI-compatible server (e.g. fake_llm.py for benchmarks)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_API_KEY = os.getenv("API_KEY")
 
-client = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=os.getenv("API_KEY"))
+_client = None
+
+def get_client():
+    """The OpenAI client is created (and the openai package imported) on first use."""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY)
+    return _client
 
 # Identify the Operating System to execute platform-specific commands later
 OS_NAME = platform.system()
@@ -50,6 +101,59 @@ OS_NAME = platform.system()
 
 #  1. SYSTEM FUNCTIONS (Tools the AI can use) 
 
+# Knowledge lookups for get_wikipedia: SQLite cache in front of Wikipedia (see knowledge.py for warm-up)
+knowledge = knowledge_from_env()
+
+# Every function decorated with @TOOLS.tool is exposed to the AI. The decorator is the
+# single source of truth for the tool's name, description and parameters.
+TOOLS = ToolRegistry()
+
+# Dictionary mapping voice keywords (e.g., "vscode") to actual system executable names (e.g., "code")
+APP_MAPPING = {
+    "chrome": "chrome",
+    "google chrome": "chrome",
+    "spotify": "spotify",
+    "notepad": "notepad",
+    "calculator": "calc",
+    "calc": "calc",
+    "vscode": "code",
+    "visual studio code": "code",
+    "excel": "excel",
+    "word": "winword",
+    "powerpoint": "powerpnt",
+    "edge": "msedge",
+    "firefox": "firefox"
+}
+
+# Words Whisper should expect in commands; the fast transcription profile passes them as initial_prompt
+TRANSCRIPTION_VOCABULARY = "Jarvis, " + ", ".join(sorted(set(APP_MAPPING) | set(KNOWN_SITES))) + "."
+
+@TOOLS.tool(
+    description="Opens a specific website URL. Use for requests like 'open YouTube', 'open ChatGPT', 'open Netflix'.",
+    parameters={"url": {"type": "string", "description": "The full URL (e.g., https://youtube.com)"}},
+    confirm=lambda args, result: f"Opening {args['url'].split('://')[-1].removeprefix('www.').rstrip('/')}.",
+)
+def open_website(url):
+    """Opens a URL in the default browser."""
+    webbrowser.open(url)
+    return f"Opened {url}."
+
+# Apps we started on Linux: PID -> (name, process). Finished ones are reaped on the next launch.
+LAUNCHED_APPS = {}
+
+def track_launched_app(app_name, process):
+    for pid, (name, launched) in list(LAUNCHED_APPS.items()):
+        if launched.poll() is not None:
+            del LAUNCHED_APPS[pid]
+    LAUNCHED_APPS[process.pid] = (app_name, process)
+    print(f"[LOG] Launched {app_name} (PID {process.pid})")
+
+@TOOLS.tool(
+    description="Opens a local installed application. Use for 'open spotify', 'open notepad', 'open calculator'.",
+    parameters={"app_name": {"type": "string", "description": "Name of the app (e.g., spotify, notepad, calc)"}},
+    confirm="Opening {app_name}.",
+    timeout=5,
+)
 def open_application(app_name):
     """
     Opens a local application. Includes a mapping for common apps to ensure accuracy.
@@ -57,25 +161,8 @@ def open_application(app_name):
     try:
         app_name = app_name.lower()
         
-        # Dictionary mapping voice keywords (e.g., "vscode") to actual system executable names (e.g., "code")
-        app_mapping = {
-            "chrome": "chrome",
-            "google chrome": "chrome",
-            "spotify": "spotify",
-            "notepad": "notepad",
-            "calculator": "calc",
-            "calc": "calc",
-            "vscode": "code",
-            "visual studio code": "code",
-            "excel": "excel",
-            "word": "winword",
-            "powerpoint": "powerpnt",
-            "edge": "msedge",
-            "firefox": "firefox"
-        }
-        
         # Look up the executable name, defaulting to the input if not found
-        target_app = app_mapping.get(app_name, app_name)
+        target_app = APP_MAPPING.get(app_name, app_name)
         
         # Execute the command based on the detected OS
         if OS_NAME == "Windows":
@@ -85,13 +172,87 @@ def open_application(app_name):
             # 'open -a' is the macOS command to launch an application by name
             os.system(f"open -a {target_app}")
         elif OS_NAME == "Linux":
-            # On Linux, we call the executable directly (assuming it's in the PATH)
-            subprocess.call([target_app])
+            # On Linux, we call the executable directly (assuming it's in the PATH).
+            # Launch it detached (own session, no pipes) and just remember the PID;
+            # waiting for it would hold the request open until the user closes the app.
+            process = subprocess.Popen(
+                [target_app],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            track_launched_app(app_name, process)
             
         return f"Opened {app_name}."
     except Exception as e:
         return f"Failed to open {app_name}. Error: {str(e)}"
 
+@TOOLS.tool(
+    description="Controls music playback. Supports 'nexttrack', 'prevtrack', 'playpause'.",
+    parameters={"action": {"type": "string", "enum": ["nexttrack", "prevtrack", "playpause"]}},
+    confirm=lambda args, result: {
+        "nexttrack": "Skipping to the next track.",
+        "prevtrack": "Going back to the previous track.",
+        "playpause": "Done.",
+    }[args["action"]],
+    concurrent=False,  # Key presses must not interleave with other keyboard/mouse tools
+)
+def media_control(action):
+    """Presses a media key (next/previous track, play/pause)."""
+    import pyautogui                                        # Automate keyboard/mouse actions (imported on first use)
+    pyautogui.press(action)
+    return f"Media {action}."
+
+@TOOLS.tool(
+    description="Searches Google for a term.",
+    parameters={"query": {"type": "string", "description": "The search term"}},
+    confirm="Here are the Google results for {query}.",
+)
+def search_google(query):
+    """Opens a Google search for the query in the default browser."""
+    webbrowser.open(f"https://www.google.com/search?q={query}")
+    return f"Searching Google for {query}."
+
+@TOOLS.tool(
+    description="Looks up a topic on Wikipedia.",
+    parameters={"q": {"type": "string", "description": "The topic to search"}},
+    summarize=True,  # The raw summary reads better once the AI has condensed it
+    cacheable=True,  # Looking something up has no side effects, so the AI's decision can be reused
+    timeout=8,
+)
+def get_wikipedia(q):
+    """Returns a two sentence Wikipedia summary (served from the local knowledge cache when possible)."""
+    return knowledge.lookup(q)
+
+@TOOLS.tool(
+    description="Types text into the currently focused window.",
+    parameters={"text": {"type": "string", "description": "Text to type"}},
+    confirm="Done.",
+    concurrent=False,
+)
+def type_text(text):
+    """Types text into whatever window has focus."""
+    import pyautogui
+    pyautogui.typewrite(text)
+    return "Typed the text."
+
+@TOOLS.tool(description="Gets current time.", confirm="It's {result}.")
+def get_time():
+    """Current time, e.g. 03:15 PM."""
+    return datetime.datetime.now().strftime("%I:%M %p")
+
+@TOOLS.tool(description="Gets current date.", confirm="Today is {result}.")
+def get_date():
+    """Current date, e.g. October 17, 2026."""
+    return datetime.datetime.now().strftime("%B %d, %Y")
+
+@TOOLS.tool(description="Tells a random joke.", confirm="{result}")
+def tell_joke():
+    """A random programming joke."""
+    return pyjokes.get_joke()
+
+@TOOLS.tool(description="Locks the computer screen.", confirm="Locking the screen.")
 def lock_screen():
     """Locks the workstation."""
     try:
@@ -105,6 +266,12 @@ def lock_screen():
     except Exception as e:
         return f"Error locking screen: {str(e)}"
 
+@TOOLS.tool(
+    name="volume_control",
+    description="Changes system volume. Supports 'up' (increase), 'down' (decrease), 'mute'.",
+    parameters={"action": {"type": "string", "enum": ["up", "down", "mute"], "description": "The volume action to perform"}},
+    confirm=lambda args, result: {"up": "Volume up.", "down": "Volume down.", "mute": "Muted."}[args["action"]],
+)
 def system_volume(action):
     """
     Controls system volume robustly across OS.
@@ -141,6 +308,7 @@ def system_volume(action):
     except Exception as e:
         return f"Error changing volume: {str(e)}"
 
+@TOOLS.tool(description="Shuts down the computer completely.", confirm="Shutting down the system now.")
 def shutdown_system():
     """Shuts down the computer."""
     try:
@@ -154,6 +322,7 @@ def shutdown_system():
     except Exception as e:
         return f"Could not shutdown. Error: {str(e)}"
 
+@TOOLS.tool(description="Restarts or reboots the computer.", confirm="Restarting the system now.")
 def restart_system():
     """Restarts the computer."""
     try:
@@ -167,280 +336,561 @@ def restart_system():
     except Exception as e:
         return f"Could not restart. Error: {str(e)}"
 
+@TOOLS.tool(description="Wakes the computer screen up if it is asleep (switches on display).", confirm="Waking the screen.",
+            concurrent=False)
 def wake_screen():
     """Wakes the screen up (Simulates mouse movement)."""
     try:
         # Move the mouse slightly to trigger display wake-up
+        import pyautogui
         pyautogui.moveRel(10, 10)
         pyautogui.moveRel(-10, -10)
         return "Waking screen."
     except Exception as e:
         return f"Could not wake screen: {str(e)}"
 
+# One TTS engine per process, on its own thread; voice lookup happens there when it starts.
+# Started by after_fork() in serve.py workers, in __main__ for the dev server, or on first use.
+tts_worker = TTSWorker()
+
+# Synthesized replies, stored once per (text, voice, rate) and evicted by size and age
+tts_store = AudioStore(
+    os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "jarvis-tts")),
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "100")) * 1024 * 1024,
+    max_age=int(os.getenv("TTS_CACHE_MAX_AGE", str(7 * 24 * 3600))),
+)
+
 def generate_tts(text):
-    """Generates a .wav audio file from text using pyttsx3."""
+    """Returns the filename of the spoken reply, synthesizing it only if it isn't stored yet."""
     try:
-        engine = pyttsx3.init()
-        voices = engine.getProperty('voices')
-        # Try to find a decent voice (David/Zira on Windows, Google on other platforms)
-        for voice in voices:
-            if "david" in voice.name.lower() or "zira" in voice.name.lower() or "google" in voice.name.lower():
-                engine.setProperty('voice', voice.id)
-                break
-        
-        # Create a temporary file to save the audio
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        temp_path = temp_file.name
-        temp_file.close() 
-
-        # Save the spoken text to the file and run the engine
-        engine.save_to_file(text, temp_path)
-        engine.runAndWait()
-        return temp_path
+        # The voice is resolved by the worker when it starts and is part of the cache key
+        with span("tts") as fields:
+            tts_worker.wait_ready(timeout=30)
+            filename = AudioStore.key(text, tts_worker.voice_id, tts_worker.rate)
+            fields["cached"] = bool(tts_store.lookup(filename))
+            if fields["cached"]:
+                return filename
+
+            tts_store.put(filename, tts_worker.synthesize(text))
+            return filename
     except Exception as e:
         print(f"TTS Error: {e}")
         return None
 
 
 #  2. DYNAMIC TOOL REGISTRY 
-# This dictionary maps string names (defined in the AI schema below) to the actual python functions above.
-# When the AI returns a function name (e.g., "open_application"), Python looks it up here to execute it.
-TOOL_REGISTRY = {
-    "open_website": webbrowser.open,
-    "open_application": open_application,
-    "media_control": pyautogui.press,
-    "volume_control": system_volume,
-    "search_google": lambda q: webbrowser.open(f"https://www.google.com/search?q={q}"),
-    "get_wikipedia": lambda q: wikipedia.summary(q, sentences=2),
-    "get_time": lambda **kwargs: datetime.datetime.now().strftime("%I:%M %p"),
-    "get_date": lambda **kwargs: datetime.datetime.now().strftime("%B %d, %Y"),
-    "tell_joke": lambda **kwargs: pyjokes.get_joke(),
-    "type_text": pyautogui.typewrite,
-    "lock_screen": lock_screen,
-    "shutdown_system": shutdown_system,
-    "restart_system": restart_system,
-    "wake_screen": wake_screen,
-}
+# Freeze the registry: the tool schema list sent to the AI is generated once, here.
+# LLM_CONFIRM_TOOLS (comma separated, or "*") lists tools whose confirmation should still be
+# worded by a second AI call instead of their local template.
+# TOOL_REGISTRY maps string names (e.g., "open_application") to the actual python functions above.
+TOOLS.freeze(llm_confirm={name.strip() for name in os.getenv("LLM_CONFIRM_TOOLS", "").split(",") if name.strip()})
+TOOL_REGISTRY = TOOLS.functions
+
+# Local fast-path in front of the LLM. Tune INTENT_MATCH_THRESHOLD using the hit rates on /stats.
+intent_matcher = IntentMatcher(APP_MAPPING.keys(), threshold=float(os.getenv("INTENT_MATCH_THRESHOLD", "0.8")))
+
+# Tool calls run on a bounded pool with per-tool timeouts (TOOL_TIMEOUT is the default, TOOL_DEADLINE the cap per request)
+tool_executor = ToolExecutor(
+    max_workers=int(os.getenv("TOOL_WORKERS", "8")),
+    default_timeout=float(os.getenv("TOOL_TIMEOUT", "10")),
+    deadline=float(os.getenv("TOOL_DEADLINE", "15")),
+)
+
+# Cache of AI intent decisions. INTENT_CACHE_SIMILARITY (e.g. 0.9) enables near-duplicate lookups.
+intent_cache = IntentCache(
+    max_entries=int(os.getenv("INTENT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+    similarity=float(os.getenv("INTENT_CACHE_SIMILARITY")) if os.getenv("INTENT_CACHE_SIMILARITY") else None,
+)
+
+# Conversation history per client session (X-Session-ID), compacted to a fixed token budget.
+# Kept in SQLite (SESSION_DB, by default the knowledge cache file) so every worker process sees it.
+sessions = SessionStore(
+    os.getenv("SESSION_DB", knowledge.db_path),
+    max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "1800")),
+    token_budget=int(os.getenv("SESSION_TOKEN_BUDGET", "600")),
+    keep_turns=int(os.getenv("SESSION_KEEP_TURNS", "4")),
+)
+
+# Energy/VAD gate in front of Whisper (SPEECH_GATE=0 disables it; thresholds via SPEECH_GATE_*)
+speech_gate = speech_gate_from_env()
 
 
 #  3. THE BRAIN (AI PROCESSOR) 
 
-def analyze_intent_with_ai(user_text):
-    """Sends the user text to AI to determine intent and parameters."""
-    
-    # Define the "Tools" (Function Calling schema) available to the LLM.
-    # This tells the AI what functions exist, what they do, and what arguments they require.
-    tools_definition = [
-        {"type": "function", "function": {
-            "name": "open_website", 
-            "description": "Opens a specific website URL. Use for requests like 'open YouTube', 'open ChatGPT', 'open Netflix'.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "url": {"type": "string", "description": "The full URL (e.g., https://youtube.com)"}
-                },
-                "required": ["url"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "open_application", 
-            "description": "Opens a local installed application. Use for 'open spotify', 'open notepad', 'open calculator'.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "app_name": {"type": "string", "description": "Name of the app (e.g., spotify, notepad, calc)"}
-                },
-                "required": ["app_name"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "media_control", 
-            "description": "Controls music playback. Supports 'nexttrack', 'prevtrack', 'playpause'.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "action": {"type": "string", "enum": ["nexttrack", "prevtrack", "playpause"]}
-                },
-                "required": ["action"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "volume_control", 
-            "description": "Changes system volume. Supports 'up' (increase), 'down' (decrease), 'mute'.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "action": {"type": "string", "enum": ["up", "down", "mute"], "description": "The volume action to perform"}
-                },
-                "required": ["action"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "search_google", 
-            "description": "Searches Google for a term.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "The search term"}
-                },
-                "required": ["query"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "get_wikipedia", 
-            "description": "Looks up a topic on Wikipedia.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "q": {"type": "string", "description": "The topic to search"} 
-                },
-                "required": ["q"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "type_text", 
-            "description": "Types text into the currently focused window.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "text": {"type": "string", "description": "Text to type"}
-                },
-                "required": ["text"]
-            }
-        }},
-        {"type": "function", "function": {
-            "name": "get_time", 
-            "description": "Gets current time.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-        {"type": "function", "function": {
-            "name": "get_date", 
-            "description": "Gets current date.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-         {"type": "function", "function": {
-            "name": "lock_screen", 
-            "description": "Locks the computer screen.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-        {"type": "function", "function": {
-            "name": "shutdown_system", 
-            "description": "Shuts down the computer completely.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-        {"type": "function", "function": {
-            "name": "restart_system", 
-            "description": "Restarts or reboots the computer.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-        {"type": "function", "function": {
-            "name": "wake_screen", 
-            "description": "Wakes the computer screen up if it is asleep (switches on display).",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }},
-        {"type": "function", "function": {
-            "name": "tell_joke", 
-            "description": "Tells a random joke.",
-            "parameters": {"type": "object", "properties": {}, "required": []}
-        }}
-    ]
+MODEL_NAME = "llama-3.1-8b-instant"
+
+# JARVIS Persona: Efficient, formal, authoritative.
+SYSTEM_PROMPT = (
+    "You are JARVIS, a highly advanced AI assistant. "
+    "You are efficient, slightly formal, and execute commands immediately. "
+    "When the user asks for a task, use the appropriate tool. "
+    "After performing an action, provide a short, crisp confirmation (e.g., 'Done.' or 'Opened YouTube'). "
+    "Do not ask unnecessary questions. If you perform an action, acknowledge it."
+)
+
+# Tools report failures as text rather than raising, so recognise them by how the message starts
+FAILURE_PREFIXES = ("Error", "Failed", "Could not")
 
+def tool_failed(result):
+    return isinstance(result, str) and result.startswith(FAILURE_PREFIXES)
+
+def confirm_tool(function_name, function_args, result):
+    """Local confirmation for a tool call, or None when the AI should word the response."""
+    tool = TOOLS.get(function_name)
+    if not tool or tool_failed(result):
+        return None
     try:
-        model_name = "llama-3.1-8b-instant" 
-        
-        # JARVIS Persona: Efficient, formal, authoritative.
-        messages = [
-            {
-                "role": "system", 
-                "content": (
-                    "You are JARVIS, a highly advanced AI assistant. "
-                    "You are efficient, slightly formal, and execute commands immediately. "
-                    "When the user asks for a task, use the appropriate tool. "
-                    "After performing an action, provide a short, crisp confirmation (e.g., 'Done.' or 'Opened YouTube'). "
-                    "Do not ask unnecessary questions. If you perform an action, acknowledge it."
-                )
-            },
-            {"role": "user", "content": user_text}
-        ]
+        # Same filtered arguments the tool ran with, so stray LLM arguments can't reach the template
+        return tool.confirmation(tool.validate(function_args), result)
+    except (KeyError, IndexError, ValueError, TypeError):
+        return None
+
+def run_tool(function_name, function_args):
+    """Looks up a tool in the registry and executes it with the arguments it accepts."""
+    tool = TOOLS.get(function_name)
+    if not tool:
+        return "Error: Function not found."
+
+    # Drop extra args and check the declared ones (generated from the tool's declaration)
+    try:
+        filtered_args = tool.validate(function_args)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    # Execute the actual Python function
+    try:
+        print(f"[LOG] Running {function_name} with args {filtered_args}")
+        with tool_span(function_name):
+            return tool.function(**filtered_args)
+    except Exception as e:
+        print(f"[LOG] Execution failed: {e}")
+        return f"Error: {str(e)}"
+
+def execute_tools(tool_calls):
+    """Runs tool calls on the executor and returns their results in order."""
+    return tool_executor.run_all(
+        tool_calls,
+        run_one=lambda call: run_tool(call["name"], call["arguments"]),
+        timeout_for=lambda call: TOOLS.get(call["name"]).timeout if TOOLS.get(call["name"]) else None,
+        is_concurrent=lambda call: TOOLS.get(call["name"]).concurrent if TOOLS.get(call["name"]) else True,
+    )
+
+def resolve_locally(user_text, execute=True):
+    """
+    Local fast-path: common commands are resolved without any network round-trip. Returns None on a
+    miss, and a "tool_failed" dict (the call and its result) when the matched tool failed.
+    """
+    with span("intent_match") as fields:
+        match = intent_matcher.match(user_text)
+        fields["hit"] = bool(match)
+    if not match:
+        return None
+
+    print(f"[LOG] Local intent match: {match['tool']} {match['args']} ({match['source']}, {match['confidence']})")
+    if not execute:
+        return {"type": "action", "tool_calls": [{"name": match["tool"], "arguments": match["args"]}]}
+    call = {"id": f"local_{match['tool']}", "name": match["tool"], "arguments": match["args"]}
+    result = execute_tools([call])[0]
+    if tool_failed(result):
+        # Never speak a raw error, and never let the AI pick (and run) the tool again: intent_flow
+        # hands it the call and its result so it only words the failure
+        print(f"[LOG] Local {match['tool']} failed, asking the AI to word it: {result}")
+        return {"type": "tool_failed", "tool_calls": [call], "results": [result]}
+    # Use the tool's template when it has one; otherwise its own result sentence
+    confirmation = confirm_tool(match["tool"], match["args"], result)
+    return {"type": "action_success", "content": confirmation or str(result)}
+
+def build_messages(user_text, history=()):
+    """
+    The system prompt always comes first and never changes (nor does the tool schema), so the
+    start of every request is byte-identical and provider-side prompt caching applies.
+    Session history goes between it and the new user message.
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *history,
+        {"role": "user", "content": user_text}
+    ]
+
+def remember_turn(session_id, messages, content):
+    """Stores this request's messages (user, tool calls and results) plus the final reply in the session."""
+    if not session_id:
+        return
+    turn_start = max(i for i, message in enumerate(messages) if message["role"] == "user")
+    sessions.record(session_id, messages[turn_start:] + [{"role": "assistant", "content": content}])
 
-        print(f"[LOG] Analyzing intent for: '{user_text}'")
+def cache_resolution(user_text, resolution, history=()):
+    """Caches an AI decision when that is safe: chat answers, and tool calls of cacheable tools only."""
+    if history:
+        # The decision depended on earlier turns ("turn it up more"), so it doesn't belong to the text alone
+        return resolution
+    if resolution["type"] == "tool_calls":
+        if all(TOOLS.get(call["name"]) and TOOLS.get(call["name"]).cacheable for call in resolution["tool_calls"]):
+            intent_cache.put(user_text, resolution)
+    elif resolution["content"]:
+        intent_cache.put(user_text, resolution)
+    return resolution
 
-        # Call the Groq API with the tools definition
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            tools=tools_definition,
-            tool_choice="auto"  # Let the model decide whether to call a function or just chat
+def llm_message(response_message):
+    """The parts of a (non-streamed) LLM reply the intent flow needs, as plain dicts."""
+    return {
+        "content": response_message.content,
+        "tool_calls": [
+            {"id": tool_call.id, "name": tool_call.function.name,
+             "arguments": json.loads(tool_call.function.arguments or "{}")}
+            for tool_call in response_message.tool_calls or []
+        ],
+    }
+
+def remember_resolution(user_text, message, history=()):
+    """Turns the AI's first reply (see llm_message) into a resolution and caches it when that is safe."""
+    if message["tool_calls"]:
+        resolution = {"type": "tool_calls", "tool_calls": message["tool_calls"]}
+    else:
+        resolution = {"type": "chat", "content": message["content"]}
+    return cache_resolution(user_text, resolution, history)
+
+def dry_run(resolution):
+    """Reports what would have been executed without running anything."""
+    return {
+        "type": "action",
+        "tool_calls": [{"name": call["name"], "arguments": call["arguments"]} for call in resolution["tool_calls"]]
+    }
+
+def run_tool_calls(messages, tool_calls):
+    """
+    Runs the tool calls the AI asked for and appends them (and their results) to messages.
+    tool_calls are plain dicts: {"id", "name", "arguments"}.
+    Returns the templated confirmation, or None when the AI has to word the response.
+    """
+    print(f"[LOG] Command identified. Executing system order...")
+
+    # 1. Execute the functions locally (independent calls run concurrently, each with its own timeout)
+    with span("tools", count=len(tool_calls)):
+        results = execute_tools(tool_calls)
+
+    # 2. Append the calls and their results so the AI can formulate a final sentence if needed
+    append_tool_messages(messages, tool_calls, results)
+    confirmations = [confirm_tool(call["name"], call["arguments"], result) for call, result in zip(tool_calls, results)]
+
+    # 3. If every call succeeded and has a local template, answer without a second AI call
+    if all(confirmations):
+        print("[LOG] Using templated confirmation.")
+        return " ".join(confirmations)
+    return None
+
+def append_tool_messages(messages, tool_calls, results):
+    """Appends the assistant's tool calls and the tool results to messages, as the chat API expects them."""
+    # The function call request goes first so the AI knows the context for the next step
+    messages.append({
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {"id": call["id"], "type": "function",
+             "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}}
+            for call in tool_calls
+        ]
+    })
+
+    for call, function_response in zip(tool_calls, results):
+        # The result of each call, so the AI can word the outcome (e.g., "Spotify is now open")
+        messages.append(
+            {
+                "tool_call_id": call["id"],
+                "role": "tool",
+                "name": call["name"],
+                "content": str(function_response),
+            }
         )
 
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
+# The intent pipeline is written once, as a generator, and every serving mode drives it.
+# It yields the steps whose execution differs between modes and is sent back their results:
+#   ("blocking", function, *args)   tool work: run inline, or on a thread pool under asyncio
+#   ("llm", request)                one chat completion (request holds messages/tools); the
+#                                   driver answers with llm_message()'s {"content", "tool_calls"}
+# Errors raised by a step are thrown back into the flow, which turns them into an error reply.
+# Drivers: analyze_intent_with_ai (blocking), stream_intent_with_ai (forwards tokens as they
+# arrive) and analyze_intent_async in asgi.py.
 
-        # Check if AI decided to use a tool (Execute a command)
-        if tool_calls:
-            print(f"[LOG] Command identified. Executing system order...")
-            
-            # 1. Append the function call request to history so the AI knows context for next steps
-            messages.append(response_message)
+def intent_flow(user_text, execute=True, session_id=None):
+    """
+    Decides and carries out the response to user_text; returns the reply dict.
+    With execute=False the chosen tool calls are only reported, never run (used for batch reprocessing).
+    With a session_id the earlier turns of that session are included, and this turn is remembered.
+    """
 
-            # 2. Execute the functions locally
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_to_call = TOOL_REGISTRY.get(function_name)
-                
-                if function_to_call:
-                    # Parse arguments provided by the AI (e.g., {"app_name": "spotify"})
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Filter arguments to match function signature (prevents errors if extra args sent)
-                    sig = inspect.signature(function_to_call)
-                    filtered_args = {k: v for k, v in function_args.items() if k in sig.parameters}
-                    
-                    # Execute the actual Python function
-                    try:
-                        print(f"[LOG] Running {function_name} with args {filtered_args}")
-                        function_response = function_to_call(**filtered_args)
-                    except Exception as e:
-                        function_response = f"Error: {str(e)}"
-                        print(f"[LOG] Execution failed: {e}")
-                else:
-                    function_response = "Error: Function not found."
-
-                # 3. Append the result of the function execution back to conversation
-                # This allows the AI to formulate a final sentence based on the result (e.g., "Spotify is now open")
-                messages.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": str(function_response),
-                    }
-                )
-            
-            # 4. Get final verbal response based on the result
-            print("[LOG] Formulating verbal response...")
-            second_response = client.chat.completions.create(
-                model=model_name,
-                messages=messages,
-            )
-            
+    # 0. Local fast-path
+    local = yield ("blocking", resolve_locally, user_text, execute)
+    if local and local["type"] != "tool_failed":
+        if execute:
+            remember_turn(session_id, build_messages(user_text), local["content"])
+        return local
+
+    try:
+        history = sessions.history(session_id)
+        messages = build_messages(user_text, history)
+
+        if local:
+            # The local tool already ran and failed: the AI only words the failure, it never gets
+            # the tools (or the first completion) to run it again
+            append_tool_messages(messages, local["tool_calls"], local["results"])
+            with span("llm_second"):
+                message = yield ("llm", {"messages": messages})
+            remember_turn(session_id, messages, message["content"])
             return {
-                "type": "action_success", 
-                "content": second_response.choices[0].message.content
+                "type": "action_success",
+                "content": message["content"]
             }
 
+        # 1. Response cache: reuse what the AI decided last time for the same question.
+        # Not for follow-ups: with history the same words can mean something else.
+        resolution = None
+        if not history:
+            with span("intent_cache") as fields:
+                resolution = intent_cache.get(user_text)
+                fields["hit"] = resolution is not None
+        if resolution:
+            print(f"[LOG] Intent cache hit for: '{user_text}'")
         else:
-            # It's a general chat question (No tools used)
-            print("[LOG] General chat query detected.")
+            print(f"[LOG] Analyzing intent for: '{user_text}'")
+
+            # Call the Groq API with the tools definition
+            with span("llm_first", history_tokens=estimate_tokens(history)):
+                message = yield ("llm", {
+                    "messages": messages,
+                    "tools": TOOLS.definitions,  # Generated once from the @TOOLS.tool declarations
+                    "tool_choice": "auto",       # Let the model decide whether to call a function or just chat
+                })
+            resolution = remember_resolution(user_text, message, history)
+
+        # Check if AI decided to use a tool (Execute a command)
+        if resolution["type"] == "tool_calls":
+            if not execute:
+                return dry_run(resolution)
+
+            content = yield ("blocking", run_tool_calls, messages, resolution["tool_calls"])
+            if content is None:
+                # Failures, or results that need summarizing: get the verbal response from the AI
+                print("[LOG] Formulating verbal response...")
+                with span("llm_second"):
+                    message = yield ("llm", {"messages": messages})
+                content = message["content"]
+
+            remember_turn(session_id, messages, content)
             return {
-                "type": "chat",
-                "content": response_message.content
+                "type": "action_success",
+                "content": content
             }
 
+        # It's a general chat question (No tools used)
+        print("[LOG] General chat query detected.")
+        remember_turn(session_id, messages, resolution["content"])
+        return {
+            "type": "chat",
+            "content": resolution["content"]
+        }
+
     except Exception as e:
         print(f"AI Error: {e}")
         return {"type": "error", "content": "I encountered a problem processing that request."}
 
+def run_step(step):
+    """Executes one intent_flow step in the calling thread."""
+    kind, *args = step
+    if kind == "llm":
+        response = get_client().chat.completions.create(model=MODEL_NAME, **args[0])
+        return llm_message(response.choices[0].message)
+    function, *function_args = args
+    return function(*function_args)
+
+def analyze_intent_with_ai(user_text, execute=True, session_id=None):
+    """Sends the user text to AI to determine intent and parameters (blocking driver of intent_flow)."""
+    flow = intent_flow(user_text, execute, session_id)
+    value, error = None, None
+    while True:
+        try:
+            step = flow.send(value) if error is None else flow.throw(error)
+        except StopIteration as done:
+            return done.value
+        try:
+            value, error = run_step(step), None
+        except Exception as e:
+            value, error = None, e
+
+def stream_llm(request):
+    """Streams one chat completion: yields content tokens as they arrive, returns the llm_message() dict."""
+    # Chat answers are forwarded token by token; tool calls arrive in fragments and are assembled
+    content, calls = [], {}
+    for chunk in get_client().chat.completions.create(model=MODEL_NAME, stream=True, **request):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        if delta.content:
+            content.append(delta.content)
+            yield delta.content
+        for fragment in delta.tool_calls or []:
+            call = calls.setdefault(fragment.index, {"id": None, "name": "", "arguments": ""})
+            if fragment.id:
+                call["id"] = fragment.id
+            if fragment.function and fragment.function.name:
+                call["name"] += fragment.function.name
+            if fragment.function and fragment.function.arguments:
+                call["arguments"] += fragment.function.arguments
+    return {
+        "content": "".join(content),
+        "tool_calls": [
+            {"id": call["id"], "name": call["name"], "arguments": json.loads(call["arguments"] or "{}")}
+            for _, call in sorted(calls.items())
+        ],
+    }
+
+def stream_intent_with_ai(user_text, session_id=None):
+    """
+    Streaming driver of intent_flow: yields the reply text in pieces as soon as they exist
+    (LLM tokens, or a whole templated confirmation / cached answer), so speech can start early.
+    """
+    flow = intent_flow(user_text, session_id=session_id)
+    value, error, streamed = None, None, None
+    while True:
+        try:
+            step = flow.send(value) if error is None else flow.throw(error)
+        except StopIteration as done:
+            reply = done.value
+            break
+        try:
+            if step[0] == "llm":
+                value = yield from stream_llm(step[1])
+                streamed = value["content"]
+            else:
+                value = run_step(step)
+            error = None
+        except Exception as e:
+            value, error = None, e
+
+    # Whatever didn't come out of an LLM stream (local/cached/templated answers, errors) is sent whole
+    if reply["content"] and reply["content"] != streamed:
+        yield reply["content"]
+
+
+#  4. SHARED PIPELINE STEPS 
+
+def gate_samples(samples):
+    """Runs the speech gate; returns the (trimmed) samples to transcribe, or None when there is no speech."""
+    if speech_gate is None:
+        return samples
+    with span("gate") as fields:
+        result = speech_gate.check(samples)
+        fields.update({key: value for key, value in result.items() if key != "samples"})
+    if result["decision"] != PASS:
+        print(f"[LOG] Speech gate rejected clip: {result['decision']} (rms {result['rms']}, "
+              f"speech {result['speech_ratio']:.0%}), saved {result['saved_seconds']}s of transcription")
+    elif result["saved_seconds"]:
+        print(f"[LOG] Speech gate trimmed {result['saved_seconds']}s of silence")
+    return result["samples"]
+
+def transcribe_samples(samples, partial=False):
+    """Runs Faster-Whisper on decoded samples and returns the joined text."""
+    audio_seconds = round(len(samples) / SAMPLE_RATE, 2)
+    if partial:
+        # Partial results are thrown away a moment later, so trade accuracy for speed.
+        # Under load we simply skip them; the final transcript still goes through.
+        try:
+            with span("transcribe_partial", audio_seconds=audio_seconds):
+                return scheduler.transcribe(samples, profile="fast", vocabulary=TRANSCRIPTION_VOCABULARY)
+        except (QueueFullError, TranscriptionTimeout):
+            return ""
+    # The scheduler picks the profile from the clip length and its current load
+    with span("transcribe", audio_seconds=audio_seconds):
+        return scheduler.transcribe(samples, vocabulary=TRANSCRIPTION_VOCABULARY)
+
+def session_id_from(req):
+    """Clients keep conversation context by sending the same X-Session-ID (or session_id field) each time."""
+    session_id = req.headers.get("X-Session-ID") or req.values.get("session_id")
+    return session_id[:128] if session_id else None
+
+def respond_to_text(text, session_id=None):
+    """Takes a transcript through intent analysis and TTS; returns the JSON payload for the client."""
+    # 1. Analyze Intent & Execute (AI)
+    intent = analyze_intent_with_ai(text, session_id=session_id)
+
+    # 2. Get Response Text
+    response_text = intent.get("content", "I didn't understand that.")
+
+    # 3. Generate TTS Audio (the client fetches it from /tts/<filename>)
+    filename = generate_tts(response_text)
+
+    return {
+        "heard": text,
+        "response": response_text,
+        "audio_filename": filename
+    }
+
+
+def start_tts(sentence):
+    """Starts synthesis of one sentence; returns (filename, future) where future is None on a store hit."""
+    tts_worker.wait_ready(timeout=30)
+    filename = AudioStore.key(sentence, tts_worker.voice_id, tts_worker.rate)
+    if tts_store.lookup(filename):
+        return filename, None
+    return filename, tts_worker.submit(sentence)
+
+def finish_tts(filename, future):
+    """Waits for a sentence started by start_tts and returns its WAV bytes."""
+    if future is not None:
+        with span("tts_wait"):
+            data = future.result(timeout=30)
+        tts_store.put(filename, data)
+        return data
+    with open(tts_store.path(filename), "rb") as f:
+        return f.read()
+
+def sse(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_voice_response(text, session_id=None):
+    """
+    Streams the reply for a transcript as Server-Sent Events:
+      heard -> text (one per sentence) -> audio (one per sentence, base64 WAV) -> done
+    Each sentence is handed to TTS the moment it is complete, while the LLM keeps generating,
+    so the first audio only waits for the first sentence.
+    """
+    yield sse("heard", {"text": text})
+
+    splitter = SentenceSplitter()
+    pending = deque()     # (index, filename, future) in speaking order
+    spoken = []
+
+    def queue_sentences(sentences):
+        for sentence in sentences:
+            spoken.append(sentence)
+            filename, future = start_tts(sentence)
+            pending.append((len(spoken) - 1, filename, future))
+            yield sse("text", {"index": len(spoken) - 1, "text": sentence})
+
+    def audio_event(index, filename, future):
+        try:
+            data = finish_tts(filename, future)
+            return sse("audio", {"index": index, "audio_filename": filename,
+                                 "audio": base64.b64encode(data).decode("ascii")})
+        except Exception as e:
+            print(f"TTS Error: {e}")
+            return sse("audio", {"index": index, "error": "TTS failed"})
+
+    for piece in stream_intent_with_ai(text, session_id):
+        yield from queue_sentences(splitter.feed(piece))
+        # Send any audio that is already finished, in order, without waiting on the rest
+        while pending and (pending[0][2] is None or pending[0][2].done()):
+            yield audio_event(*pending.popleft())
+
+    yield from queue_sentences(splitter.flush())
+    while pending:
+        yield audio_event(*pending.popleft())
+
+    yield sse("done", {"response": " ".join(spoken)})
+
 
 #  FLASK ROUTES 
 
@@ -457,53 +907,293 @@ def voice_command():
         audio = request.files["audio"]
 
         # 1. Transcribe Audio (Faster-Whisper)
-        # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp:
-            audio.save(temp.name)
-            webm_path = temp.name
+        # Decode the upload straight into a 16 kHz float32 array in memory.
+        # No temp files and no ffmpeg process, so nothing can leak if we fail midway.
+        try:
+            with span("decode"):
+                samples = decode_audio(
+                    audio.read(),
+                    content_type=audio.mimetype,
+                    sample_rate=request.args.get("sample_rate", 16000, type=int),
+                )
+        except Exception as e:
+            print(f"[LOG] Audio decoding failed: {e}")
+            return jsonify({"error": "Could not decode audio. Send webm/opus, WAV or raw 16-bit PCM."}), 400
 
-        # Prepare path for the converted WAV file (Whisper needs WAV/MP3, not Webm usually)
-        wav_path = webm_path.replace(".webm", ".wav")
-        
-        # Convert Webm to Wav using ffmpeg (FFmpeg must be installed on the system)
-        exit_code = os.system(f'ffmpeg -y -i "{webm_path}" "{wav_path}"')
-        
-        if exit_code != 0:
-            return jsonify({"error": "FFmpeg conversion failed. Ensure FFmpeg is installed."}), 500
+        # Silent or speech-free clips stop here, before any Whisper work
+        samples = gate_samples(samples)
+        if samples is None:
+            return jsonify({"heard": "", "response": "I heard nothing."})
 
         print("[LOG] Transcribing audio...")
-        segments, info = model.transcribe(wav_path)
-        text = " ".join(segment.text for segment in segments).strip()
-
-        # Cleanup audio files (Delete temp files)
-        os.remove(webm_path)
-        os.remove(wav_path)
+        try:
+            text = transcribe_samples(samples)
+        except QueueFullError as e:
+            # Backpressure: tell the client to come back later instead of queuing forever
+            response = jsonify({"error": "Server is busy. Please try again shortly."})
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response, 503
+        except TranscriptionTimeout as e:
+            return jsonify({"error": str(e)}), 504
 
         if not text:
             return jsonify({"heard": "", "response": "I heard nothing."})
 
-        # 2. Analyze Intent & Execute (AI)
-        intent = analyze_intent_with_ai(text)
-
-        # 3. Get Response Text
-        response_text = intent.get("content", "I didn't understand that.")
-
-        # 4. Generate TTS Audio
-        audio_path = generate_tts(response_text)
-        
-        # Extract just the filename (not full path) for sending to client
-        filename = os.path.basename(audio_path) if audio_path else None
+        # Streaming mode (?stream=1): text and audio arrive sentence by sentence over one SSE response
+        if request.args.get("stream") in ("1", "true", "yes"):
+            return Response(
+                stream_with_context(stream_voice_response(text, session_id_from(request))),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
 
-        return jsonify({
-            "heard": text,
-            "response": response_text,
-            "audio_filename": filename 
-        })
+        return jsonify(respond_to_text(text, session_id_from(request)))
 
     except Exception as e:
         print("SERVER ERROR:", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/voice/batch", methods=["POST"])
+def voice_batch():
+    """
+    Bulk endpoint for offline reprocessing and load tests.
+    Accepts many "audio" files in one multipart request and streams back one JSON line per clip
+    (application/x-ndjson) as each batch finishes. Query parameters:
+      - batch_size: clips decoded together by the batched Whisper pipeline
+      - intents=1: also resolve the intent of each transcript (tools are NOT executed)
+    """
+    uploads = request.files.getlist("audio")
+    if not uploads:
+        return jsonify({"error": "No audio files received"}), 400
+
+    batch_size = request.args.get("batch_size", type=int)
+    with_intents = request.args.get("intents") in ("1", "true", "yes")
+
+    # Decode everything up front; clips that fail to decode are reported but don't stop the batch
+    # Clips without speech are answered right away and never reach the batched pipeline
+    clips, names, failures, silent = [], [], [], []
+    for index, upload in enumerate(uploads):
+        try:
+            samples = gate_samples(decode_audio(upload.read(), content_type=upload.mimetype))
+        except Exception as e:
+            failures.append({"index": index, "filename": upload.filename, "error": f"Could not decode audio: {e}"})
+            continue
+        if samples is None:
+            silent.append({"index": index, "filename": upload.filename, "heard": ""})
+        else:
+            clips.append(samples)
+            names.append((index, upload.filename))
+
+    # Once streaming starts the status code is sent, so a model that isn't there is refused up front
+    if clips and not scheduler.ready.is_set():
+        if scheduler.load_error:
+            return jsonify({"error": f"Speech model failed to load: {scheduler.load_error}"}), 500
+        response = jsonify({"error": "Speech model is still loading. Please try again shortly."})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+
+    def generate():
+        for failure in failures + silent:
+            yield json.dumps(failure) + "\n"
+
+        reported = set()
+        try:
+            for position, text, error in scheduler.transcribe_batch(clips, batch_size=batch_size):
+                reported.add(position)
+                index, filename = names[position]
+                if error:
+                    yield json.dumps({"index": index, "filename": filename, "error": f"Transcription failed: {error}"}) + "\n"
+                    continue
+                result = {"index": index, "filename": filename, "heard": text}
+                if with_intents and text:
+                    result["intent"] = analyze_intent_with_ai(text, execute=False)
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            # The model went away mid-batch (load failed, server lost): every clip still gets a line
+            print(f"[LOG] Batch transcription stopped: {e}")
+            for position, (index, filename) in enumerate(names):
+                if position not in reported:
+                    yield json.dumps({"index": index, "filename": filename, "error": f"Transcription failed: {e}"}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@sock.route("/voice/stream")
+def voice_stream(ws):
+    """
+    Streaming endpoint: Receives audio chunks over a WebSocket while the user is still talking.
+    Protocol:
+      - optional text message {"type": "start", "format": "pcm16" | "webm", "sample_rate": 48000, "session_id": "..."}
+      - binary messages with audio chunks
+      - text message {"type": "stop"} when recording ends (flushes the last utterance)
+    The server answers with {"type": "partial"}, {"type": "final"} and {"type": "response"} messages.
+    """
+    decoder = StreamDecoder()
+    transcriber = StreamingTranscriber(transcribe_samples)
+    session_id = session_id_from(request)
+
+    def handle(events_source, *args):
+        try:
+            events = events_source(*args)
+        except QueueFullError as e:
+            ws.send(json.dumps({"type": "error", "content": "Server is busy.", "retry_after": e.retry_after}))
+            return
+        except TranscriptionTimeout as e:
+            ws.send(json.dumps({"type": "error", "content": str(e)}))
+            return
+        for event in events:
+            ws.send(json.dumps(event))
+            if event["type"] == "final":
+                # The transcript is ready the moment speech ends, so go straight to the AI
+                print(f"[LOG] Streaming transcript finalized: '{event['text']}'")
+                ws.send(json.dumps({"type": "response", **respond_to_text(event["text"], session_id)}))
+
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+
+        if isinstance(message, str):
+            try:
+                control = json.loads(message)
+            except ValueError:
+                ws.send(json.dumps({"type": "error", "content": "Invalid control message"}))
+                continue
+
+            if control.get("type") == "start":
+                decoder = StreamDecoder(
+                    audio_format=control.get("format", "pcm16"),
+                    sample_rate=int(control.get("sample_rate", 16000)),
+                )
+                transcriber = StreamingTranscriber(transcribe_samples)
+                session_id = control.get("session_id") or session_id
+            elif control.get("type") == "stop":
+                handle(transcriber.flush)
+                # The next utterance may come from a fresh MediaRecorder with a new container header
+                decoder = StreamDecoder(audio_format=decoder.audio_format, sample_rate=decoder.sample_rate)
+            continue
+
+        try:
+            samples = decoder.decode(message)
+        except Exception as e:
+            ws.send(json.dumps({"type": "error", "content": f"Could not decode audio chunk: {e}"}))
+            continue
+        handle(transcriber.feed, samples)
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Liveness: the process is up and serving HTTP (the model may still be loading)."""
+    return jsonify({
+        "status": "ok",
+        "uptime_seconds": round(time.monotonic() - STARTED_AT, 3),
+        "startup_seconds": STARTUP_TIMES,
+    })
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    """Readiness: 200 only once the Whisper model is loaded and warmed up, so traffic can be routed here."""
+    if scheduler.ready.is_set():
+        return jsonify({"status": "ready", "startup_seconds": STARTUP_TIMES, "tts_ready": tts_worker.ready.is_set()})
+    status = "failed" if scheduler.load_error else "loading"
+    response = jsonify({"status": status, "error": str(scheduler.load_error) if scheduler.load_error else None})
+    response.headers["Retry-After"] = "5"
+    return response, 503
+
+@app.before_request
+def first_request_marks_listening():
+    # Fallback for servers we don't start ourselves: the first request proves we're listening
+    mark_listening()
+
+# Probes and scrapes would drown the request log
+UNTRACED_ROUTES = ("/metrics", "/healthz", "/readyz")
+
+@app.before_request
+def start_trace():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if route not in UNTRACED_ROUTES:
+        # Clients may pass their own ID to correlate logs across services
+        metrics.begin_request(route, request.headers.get("X-Request-ID"))
+
+@app.after_request
+def add_request_id(response):
+    if metrics.current_request_id():
+        response.headers["X-Request-ID"] = metrics.current_request_id()
+    # Streaming responses finish later, in teardown, once the last event has been sent
+    request.environ["jarvis.status"] = response.status_code
+    return response
+
+@app.teardown_request
+def finish_trace(error):
+    metrics.end_request(500 if error else request.environ.get("jarvis.status", 500))
+
+def render_metrics():
+    """Prometheus text format: stage/tool histograms plus gauges read from the components' stats()."""
+    transcription = scheduler.stats() if scheduler.ready.is_set() else {}
+    audio_total = transcription.get("audio_seconds_total", 0.0)
+    busy_total = transcription.get("busy_seconds_total", 0.0)
+
+    # (hits, lookups) per cache; the local intent matcher counts as a cache in front of the LLM
+    matcher, cache, store, known = intent_matcher.stats(), intent_cache.stats(), tts_store.stats(), knowledge.stats()
+    caches = {
+        "intent_match": (matcher["rule_hits"] + matcher["classifier_hits"], matcher["total"]),
+        "intent_cache": (cache["hits"] + cache["near_hits"], cache["hits"] + cache["near_hits"] + cache["misses"]),
+        "tts_store": (store["hits"], store["hits"] + store["misses"]),
+        "knowledge": (known["hits"] + known["negative_hits"], known["hits"] + known["negative_hits"] + known["misses"]),
+    }
+
+    # Histograms, counters and caches are per process (see metrics.py); the Whisper numbers come from
+    # the scheduler, which under serve.py is the one model server shared by every worker
+    lines = metrics.render_samples("jarvis_worker_info", "gauge", "Process that answered this scrape.",
+                                   [({"pid": os.getpid()}, 1)])
+    lines += metrics.STAGE_SECONDS.render() + metrics.TOOL_SECONDS.render() + metrics.REQUESTS.render()
+    lines += metrics.render_samples("jarvis_whisper_audio_seconds_total", "counter",
+                                    "Seconds of audio transcribed.", [({}, audio_total)])
+    lines += metrics.render_samples("jarvis_whisper_busy_seconds_total", "counter",
+                                    "Wall-clock seconds Whisper workers spent transcribing.", [({}, busy_total)])
+    lines += metrics.render_samples("jarvis_whisper_audio_seconds_per_second", "gauge",
+                                    "Audio seconds transcribed per busy wall-clock second since start.",
+                                    [({}, round(audio_total / busy_total, 3) if busy_total else 0.0)])
+    lines += metrics.render_samples("jarvis_queue_depth", "gauge", "Jobs waiting in each queue.", [
+        ({"queue": "whisper"}, transcription.get("queue_depth", 0)),
+        ({"queue": "tts"}, tts_worker.jobs.qsize()),
+    ])
+    lines += metrics.render_samples("jarvis_whisper_busy_workers", "gauge", "Whisper workers currently transcribing.",
+                                    [({}, transcription.get("busy", 0))])
+    lines += metrics.render_samples("jarvis_whisper_jobs_total", "counter", "Transcriptions by profile.",
+                                    [({"profile": name, "model": profile["model"]}, profile["jobs"])
+                                     for name, profile in transcription.get("profiles", {}).items()])
+    if speech_gate is not None:
+        gate = speech_gate.stats()
+        lines += metrics.render_samples("jarvis_speech_gate_clips_total", "counter", "Clips seen by the speech gate.",
+                                        [({"decision": decision}, gate[decision]) for decision in speech_gate.decisions])
+        lines += metrics.render_samples("jarvis_speech_gate_saved_seconds_total", "counter",
+                                        "Audio seconds the speech gate kept away from Whisper.",
+                                        [({}, gate["audio_seconds_saved"])])
+    lines += metrics.render_samples("jarvis_cache_hits_total", "counter", "Cache hits.",
+                                    [({"cache": name}, hits) for name, (hits, lookups) in caches.items()])
+    lines += metrics.render_samples("jarvis_cache_lookups_total", "counter", "Cache lookups.",
+                                    [({"cache": name}, lookups) for name, (hits, lookups) in caches.items()])
+    lines += metrics.render_samples("jarvis_cache_hit_ratio", "gauge", "Cache hit ratio since start.",
+                                    [({"cache": name}, round(hits / lookups, 3) if lookups else 0.0)
+                                     for name, (hits, lookups) in caches.items()])
+    return "\n".join(lines) + "\n"
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/stats", methods=["GET"])
+def get_stats():
+    """Runtime counters for tuning: local intent and cache hit rates, transcription queue state."""
+    return jsonify({
+        "intent_matcher": intent_matcher.stats(),
+        "intent_cache": intent_cache.stats(),
+        "tts_store": tts_store.stats(),
+        "knowledge": knowledge.stats(),
+        "transcription": scheduler.stats(),
+        "speech_gate": speech_gate.stats() if speech_gate else None,
+        "sessions": sessions.stats(),
+    })
+
 @app.route("/tts/<filename>", methods=["GET"])
 def get_tts_file(filename):
     """
@@ -511,26 +1201,49 @@ def get_tts_file(filename):
     The frontend receives the filename from /voice, then calls this endpoint to download/play it.
     """
     try:
-        # Locate file in the system's temp directory
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, filename)
-        
-        if os.path.exists(file_path):
-            return send_file(file_path, mimetype="audio/wav")
+        file_path = tts_store.path(filename)
+
+        if file_path:
+            # Files are content-addressed and never change, so the name is a perfect ETag.
+            # conditional=True answers If-None-Match with 304 and supports Range requests for seeking.
+            return send_file(
+                file_path,
+                mimetype="audio/wav",
+                etag=filename.removesuffix(".wav"),
+                conditional=True,
+                max_age=int(os.getenv("TTS_CACHE_MAX_AGE", str(7 * 24 * 3600))),
+            )
         else:
             return jsonify({"error": "File not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def after_fork():
+    """
+    Called by serve.py in every worker forked from the preloaded master process.
+    Module state is shared copy-on-write, but threads, thread pools and SQLite
+    connections don't survive fork(), so those are recreated here.
+    """
+    scheduler.after_fork()
+    tts_worker.after_fork()
+    tool_executor.after_fork()
+    knowledge.after_fork()
+    sessions.after_fork()
+
+
 #  MAIN ENTRY POINT 
+# Development server. For production use serve.py (gunicorn, several workers, one shared model).
 if __name__ == "__main__":
     print("")
     print("JARVIS SYSTEM ONLINE")
     print(f"OS Detected: {OS_NAME}")
-    print("Faster-Whisper Model: (CPU, INT8)")
-    print("Groq API: Connected")
+    print(f"Faster-Whisper Model: (CPU, INT8, {scheduler.replicas} replicas, loading in background)")
+    print("Groq API: Configured")
     print("Waiting for voice commands...")
     print("")
-    # Run Flask server accessible on the local network
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Run Flask server accessible on the local network. The socket is bound right after this line.
+    mark_listening()
+    tts_worker.start()
+    # No reloader: it would start a second process with a second copy of the model
+    app.run(host="0.0.0.0", port=5000, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,201 @@
+import asyncio                                              # Event loop, executors and timeouts
+import contextvars                                          # Carry the request's trace into the blocking pool
+import os                                                   # Paths and environment-based configuration
+from concurrent.futures import ThreadPoolExecutor          # Bounded pool for blocking work (tools, TTS)
+from contextlib import asynccontextmanager                 # Startup/shutdown of the shared HTTP pool
+import httpx                                                # Keep-alive connection pool for the LLM client
+from openai import AsyncOpenAI                              # Non-blocking client for the Groq API
+from starlette.applications import Starlette               # Minimal ASGI framework
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+import app as jarvis                                        # Reuse the tools, caches, scheduler and TTS from the Flask app
+import metrics                                              # Same timing spans and /metrics as the Flask app
+from metrics import span
+
+#  ASYNC (ASGI) SERVING MODE
+# Same /voice and /tts/<filename> API as the Flask app, but served by an event loop:
+# a request waiting on Groq is a suspended coroutine, not a blocked OS thread.
+#   - LLM calls use AsyncOpenAI over one shared keep-alive httpx pool
+#   - Whisper jobs go through the same scheduler; we await its futures without blocking a thread
+#   - Tool execution and TTS (blocking, CPU/OS bound) run in a bounded thread pool
+#
+# Run with:  uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+# Threads for blocking work. Sized for tools and TTS, not for the number of in-flight requests.
+blocking_pool = ThreadPoolExecutor(max_workers=int(os.getenv("ASGI_BLOCKING_THREADS", "16")), thread_name_prefix="jarvis-blocking")
+
+# Created on startup so the pool belongs to the running event loop
+llm = None
+
+
+async def run_blocking(function, *args):
+    # run_in_executor doesn't copy contextvars; do it so spans land in this request's trace
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(blocking_pool, context.run, function, *args)
+
+
+async def analyze_intent_async(user_text, execute=True, session_id=None):
+    """Async driver of app.intent_flow: LLM calls are awaited, blocking steps go to the thread pool."""
+    flow = jarvis.intent_flow(user_text, execute, session_id)
+    value, error = None, None
+    while True:
+        try:
+            step = flow.send(value) if error is None else flow.throw(error)
+        except StopIteration as done:
+            return done.value
+        try:
+            if step[0] == "llm":
+                response = await llm.chat.completions.create(model=jarvis.MODEL_NAME, **step[1])
+                value = jarvis.llm_message(response.choices[0].message)
+            else:
+                value = await run_blocking(*step[1:])
+            error = None
+        except Exception as e:
+            value, error = None, e
+
+
+async def transcribe_async(samples):
+    """Queues the clip on the Whisper scheduler and awaits the result without holding a thread."""
+    future = jarvis.scheduler.submit(samples, vocabulary=jarvis.TRANSCRIPTION_VOCABULARY)
+    try:
+        with span("transcribe", audio_seconds=round(len(samples) / jarvis.SAMPLE_RATE, 2)):
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=jarvis.scheduler.job_timeout)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise jarvis.TranscriptionTimeout(f"Transcription did not finish within {jarvis.scheduler.job_timeout:.0f}s.")
+
+
+async def voice_command(request):
+    """Main endpoint: Receives audio, transcribes it, processes intent, and returns text + audio file."""
+    trace = metrics.begin_request("/voice", request.headers.get("x-request-id"))
+    response = await handle_voice(request)
+    response.headers["X-Request-ID"] = trace.request_id
+    metrics.end_request(response.status_code)
+    return response
+
+
+async def handle_voice(request):
+    try:
+        form = await request.form()
+        audio = form.get("audio")
+        if audio is None or isinstance(audio, str):
+            return JSONResponse({"error": "No audio file received"}, status_code=400)
+
+        data = await audio.read()
+        try:
+            # Decoding is quick but CPU bound; keep it off the loop
+            with span("decode"):
+                samples = await run_blocking(
+                    lambda: jarvis.decode_audio(
+                        data,
+                        content_type=audio.content_type,
+                        sample_rate=int(request.query_params.get("sample_rate", 16000)),
+                    )
+                )
+        except Exception as e:
+            print(f"[LOG] Audio decoding failed: {e}")
+            return JSONResponse({"error": "Could not decode audio. Send webm/opus, WAV or raw 16-bit PCM."}, status_code=400)
+
+        # VAD is CPU work too; keep it off the loop
+        samples = await run_blocking(jarvis.gate_samples, samples)
+        if samples is None:
+            return JSONResponse({"heard": "", "response": "I heard nothing."})
+
+        print("[LOG] Transcribing audio...")
+        try:
+            text = await transcribe_async(samples)
+        except jarvis.QueueFullError as e:
+            return JSONResponse(
+                {"error": "Server is busy. Please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        except jarvis.TranscriptionTimeout as e:
+            return JSONResponse({"error": str(e)}, status_code=504)
+
+        if not text:
+            return JSONResponse({"heard": "", "response": "I heard nothing."})
+
+        session_id = request.headers.get("x-session-id") or form.get("session_id") or None
+        intent = await analyze_intent_async(text, session_id=session_id[:128] if session_id else None)
+        response_text = intent.get("content", "I didn't understand that.")
+
+        filename = await run_blocking(jarvis.generate_tts, response_text)
+
+        return JSONResponse({
+            "heard": text,
+            "response": response_text,
+            "audio_filename": filename
+        })
+
+    except Exception as e:
+        print("SERVER ERROR:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def get_tts_file(request):
+    """Serves the generated audio back to the frontend (content-addressed, so ETags never go stale)."""
+    filename = request.path_params["filename"]
+    file_path = jarvis.tts_store.path(filename)
+    if not file_path:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+
+    etag = f'"{filename.removesuffix(".wav")}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    # FileResponse handles Range requests so the browser Audio element can seek
+    return FileResponse(file_path, media_type="audio/wav", headers={"ETag": etag, "Cache-Control": "public, max-age=604800"})
+
+
+async def get_metrics(request):
+    return PlainTextResponse(await run_blocking(jarvis.render_metrics), media_type="text/plain; version=0.0.4")
+
+
+async def healthz(request):
+    """Liveness: the process is up (the model may still be loading)."""
+    return JSONResponse({"status": "ok", "startup_seconds": jarvis.STARTUP_TIMES})
+
+
+async def readyz(request):
+    """Readiness: 200 only once the Whisper model is loaded and warmed up."""
+    if jarvis.scheduler.ready.is_set():
+        return JSONResponse({"status": "ready", "startup_seconds": jarvis.STARTUP_TIMES})
+    status = "failed" if jarvis.scheduler.load_error else "loading"
+    return JSONResponse({"status": status}, status_code=503, headers={"Retry-After": "5"})
+
+
+@asynccontextmanager
+async def lifespan(application):
+    global llm
+    # One pool for every request: connections to Groq stay open and are reused
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "20")),
+        ),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    )
+    llm = AsyncOpenAI(base_url=jarvis.LLM_BASE_URL, api_key=jarvis.LLM_API_KEY, http_client=http_client)
+    jarvis.mark_listening()
+    jarvis.tts_worker.start()
+    print("JARVIS ASGI MODE ONLINE")
+    try:
+        yield
+    finally:
+        await llm.close()
+        blocking_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/voice", voice_command, methods=["POST"]),
+        Route("/tts/{filename}", get_tts_file, methods=["GET"]),
+        Route("/healthz", healthz, methods=["GET"]),
+        Route("/metrics", get_metrics, methods=["GET"]),
+        Route("/readyz", readyz, methods=["GET"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,76 @@
+import io                                                   # Wrap uploaded bytes in file-like objects for the decoders
+import wave                                                 # Parse WAV headers without spawning any external process
+import numpy as np                                          # Float32 sample arrays that Faster-Whisper accepts directly
+
+#  AUDIO DECODING
+# Faster-Whisper expects 16 kHz mono float32 samples in the range [-1.0, 1.0].
+# Everything in this module turns uploaded bytes into exactly that, in memory,
+# so the /voice path never writes temp files or forks ffmpeg.
+
+SAMPLE_RATE = 16000
+
+# MIME types the frontend (or other clients) may use for headerless 16-bit PCM
+RAW_PCM_TYPES = ("audio/pcm", "audio/l16", "audio/x-raw", "application/octet-stream")
+
+
+def _resample(samples, source_rate, target_rate=SAMPLE_RATE):
+    """Linear resampling; good enough for speech going into Whisper."""
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    duration = len(samples) / source_rate
+    target_length = int(round(duration * target_rate))
+    source_positions = np.arange(len(samples)) / source_rate
+    target_positions = np.arange(target_length) / target_rate
+    return np.interp(target_positions, source_positions, samples).astype(np.float32)
+
+
+def pcm16_to_float32(data, sample_rate=SAMPLE_RATE, channels=1):
+    """Converts raw little-endian 16-bit PCM bytes to 16 kHz mono float32."""
+    # Drop a trailing odd byte instead of failing on a truncated upload
+    usable = len(data) - (len(data) % (2 * channels))
+    samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return _resample(samples, sample_rate)
+
+
+def _decode_wav(data):
+    """Fast path for uncompressed PCM WAV files (no PyAV involved)."""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            # 8/24/32-bit WAVs are rare from browsers; let PyAV handle them
+            return None
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    return pcm16_to_float32(frames, sample_rate=rate, channels=channels)
+
+
+def decode_audio(data, content_type=None, sample_rate=SAMPLE_RATE):
+    """
+    Decodes an uploaded audio blob into a 16 kHz mono float32 numpy array.
+    Supports the webm/opus blobs sent by the browser's MediaRecorder, WAV files,
+    and raw 16-bit PCM (when the content type says so).
+    """
+    if not data:
+        return np.zeros(0, dtype=np.float32)
+
+    mime = (content_type or "").split(";")[0].strip().lower()
+
+    # 1. Raw PCM has no header, so we can only recognise it by its MIME type
+    if mime in RAW_PCM_TYPES:
+        return pcm16_to_float32(data, sample_rate=sample_rate)
+
+    # 2. WAV: parse in pure Python, which avoids container probing entirely
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            samples = _decode_wav(data)
+            if samples is not None:
+                return samples
+        except wave.Error:
+            pass  # Fall through to PyAV, which is more forgiving with odd headers
+
+    # 3. Everything else (webm/opus, ogg, mp3, m4a...) goes through PyAV in-process.
+    # Imported on first use so that starting the server doesn't load faster-whisper.
+    from faster_whisper import decode_audio as _av_decode
+    return _av_decode(io.BytesIO(data), sampling_rate=SAMPLE_RATE)
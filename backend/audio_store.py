@@ -0,0 +1,133 @@
+import hashlib                                              # Content addressing: hash of (text, voice, rate)
+import os                                                   # Files, sizes and timestamps
+import re                                                   # Validate requested filenames
+import stat                                                 # Only regular files count as stored
+import threading                                            # Hit/miss counters are shared by request threads
+import time                                                 # Age-based eviction
+import uuid                                                 # Unique names for in-progress writes
+
+#  TTS AUDIO STORE
+# Synthesized replies are stored once under a hash of what produced them
+# (text, voice, speaking rate). A repeated reply like "Done." is served from
+# here without running TTS at all. Total size and age are bounded: the least
+# recently used files are deleted first, so the directory can't grow forever.
+# The directory itself is the index. Under serve.py every worker process shares it, so a
+# file written by one worker is served by all of them, and the byte budget and LRU order
+# (file mtimes, refreshed on every use) hold for the whole directory, not per process.
+
+_FILENAME = re.compile(r"^[0-9a-f]{32}\.wav$")
+
+# Interrupted writes older than this are garbage; younger ones may belong to another worker
+_STALE_PART_SECONDS = 3600
+
+
+class AudioStore:
+    def __init__(self, directory, max_bytes=100 * 1024 * 1024, max_age=7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._evict()
+
+    @staticmethod
+    def key(text, voice, rate):
+        digest = hashlib.sha256(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+        return f"{digest[:32]}.wav"
+
+    def path(self, filename):
+        """Full path for a stored file, or None if the name is invalid or not stored."""
+        if not _FILENAME.match(filename):
+            return None
+        full_path = os.path.join(self.directory, filename)
+        try:
+            info = os.stat(full_path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(info.st_mode):
+            return None
+        if time.time() - info.st_mtime > self.max_age:
+            self._remove(full_path)
+            return None
+        try:
+            os.utime(full_path)  # Marks it as recently used for every process
+        except OSError:
+            return None  # Evicted by another worker in the meantime
+        return full_path
+
+    def lookup(self, filename):
+        """Like path(), but counts as a cache lookup for the hit/miss statistics."""
+        found = self.path(filename)
+        with self.lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def put(self, filename, data):
+        final_path = os.path.join(self.directory, filename)
+        # Write to a temporary name and rename, so readers never see a half-written file
+        partial_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        with open(partial_path, "wb") as f:
+            f.write(data)
+        os.replace(partial_path, final_path)
+        self._evict()
+        return final_path
+
+    def stats(self):
+        entries = self._scan()
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "files": len(entries),
+                "bytes": sum(size for _, _, size in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _scan(self):
+        """(last used, path, size) of every stored file, oldest first; clears out stale partial writes."""
+        now = time.time()
+        entries = []
+        with os.scandir(self.directory) as listing:
+            for entry in listing:
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue  # Removed by another worker while we were listing
+                if entry.name.endswith(".part"):
+                    if now - info.st_mtime > _STALE_PART_SECONDS:
+                        self._remove(entry.path)
+                elif _FILENAME.match(entry.name) and stat.S_ISREG(info.st_mode):
+                    entries.append((info.st_mtime, entry.path, info.st_size))
+        entries.sort()
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        # 1. Anything too old, regardless of space
+        for last_used, full_path, size in self._scan():
+            if now - last_used > self.max_age:
+                self._remove(full_path)
+            else:
+                entries.append((last_used, full_path, size))
+        # 2. Least recently used first, until the directory is back under the byte budget
+        total_bytes = sum(size for _, _, size in entries)
+        while total_bytes > self.max_bytes and len(entries) > 1:
+            _, full_path, size = entries.pop(0)
+            self._remove(full_path)
+            total_bytes -= size
+
+    @staticmethod
+    def _remove(full_path):
+        try:
+            os.remove(full_path)
+        except OSError:
+            pass  # Another worker got there first
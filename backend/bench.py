@@ -0,0 +1,288 @@
+import argparse                                             # Command line: corpus / run / compare
+import io                                                   # Uploads from in-memory clip bytes
+import json                                                 # Corpus index and result files
+import math                                                 # Nearest-rank percentiles
+import os                                                   # Environment for the app under test
+import platform                                             # Machine description in the results
+import subprocess                                           # Stubbed: tools must not launch anything
+import sys                                                  # Stub modules, exit codes
+import tempfile                                             # Throwaway caches per run
+import threading                                            # Per-thread test clients
+import time                                                 # Wall-clock timing
+import types                                                # Stub pyautogui module
+import webbrowser                                           # Stubbed: tools must not open a browser
+from concurrent.futures import ThreadPoolExecutor          # Concurrent requests
+from fake_llm import FakeLLM                                # Offline stand-in for Groq
+
+#  END-TO-END BENCHMARK
+# Drives the real /voice route (decode -> Whisper -> intent -> tools -> TTS) in-process
+# with a corpus of spoken commands at a given concurrency, and reports p50/p95/p99 per
+# stage (from the request traces, see metrics.py) plus throughput. Everything runs
+# offline: the LLM is fake_llm.py, Wikipedia is a fixture, and tools can't touch the
+# machine (pyautogui, browser, os.system and subprocess are stubbed).
+#
+#   python bench.py corpus bench-corpus                 # synthesize the default clips (pyttsx3/espeak)
+#   python bench.py run bench-corpus --concurrency 4 --requests 100 --output results.json
+#   python bench.py compare baseline.json results.json --tolerance 0.15   # exit code 1 on regression
+#
+# A corpus is a directory of .wav files; recorded clips work as well as synthetic ones.
+
+# A mix of local fast-path commands, LLM tool calls (one and several) and chat questions
+DEFAULT_COMMANDS = [
+    "open youtube",
+    "what time is it",
+    "tell me a joke",
+    "who was Alan Turing",
+    "open spotify and turn the volume up",
+    "how far away is the moon",
+    "search google for the weather in paris",
+    "write a haiku about coffee",
+]
+
+KNOWLEDGE_FIXTURE = {
+    "alan turing": "Alan Turing was an English mathematician and computer scientist. "
+                   "He is widely considered to be the father of theoretical computer science.",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def stub_side_effects():
+    """Replaces everything a tool could use to act on the machine with no-ops."""
+    class FakeProcess:
+        next_pid = 100000
+
+        def __init__(self, *args, **kwargs):
+            FakeProcess.next_pid += 1
+            self.pid = FakeProcess.next_pid
+            self.returncode = 0
+
+        def poll(self):
+            return 0
+
+        def wait(self, timeout=None):
+            return 0
+
+    sys.modules["pyautogui"] = types.SimpleNamespace(
+        press=lambda *args, **kwargs: None,
+        typewrite=lambda *args, **kwargs: None,
+        moveRel=lambda *args, **kwargs: None,
+    )
+    webbrowser.open = lambda *args, **kwargs: True
+    os.system = lambda command: 0
+    subprocess.Popen = FakeProcess
+    subprocess.run = lambda args, *rest, **kwargs: subprocess.CompletedProcess(args, 0)
+
+
+def build_corpus(directory, commands):
+    """Synthesizes one WAV clip per command with the app's own TTS engine."""
+    from tts import TTSWorker
+    os.makedirs(directory, exist_ok=True)
+    worker = TTSWorker()
+    index = []
+    for position, text in enumerate(commands):
+        name = f"{position:02d}-{'-'.join(text.lower().split())[:40]}.wav"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(worker.synthesize(text))
+        index.append({"file": name, "text": text})
+        print(f"[LOG] Wrote {name}")
+    with open(os.path.join(directory, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+
+
+def load_corpus(directory):
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".wav"):
+            with open(os.path.join(directory, name), "rb") as f:
+                clips.append((name, f.read()))
+    if not clips:
+        raise SystemExit(f"No .wav files in {directory}; create some with: python bench.py corpus {directory}")
+    return clips
+
+
+def percentiles(values):
+    """Nearest-rank percentiles in milliseconds."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f"p{p}": round(ordered[max(0, math.ceil(p * len(ordered) / 100) - 1)], 2) for p in PERCENTILES}
+    summary["count"] = len(ordered)
+    return summary
+
+
+def configure_environment(args, scratch):
+    """Settings for the app under test; must happen before app.py is imported."""
+    fixture_path = os.path.join(scratch, "knowledge.json")
+    with open(fixture_path, "w", encoding="utf-8") as f:
+        json.dump(KNOWLEDGE_FIXTURE, f)
+    os.environ.update({
+        "API_KEY": "bench",
+        "KNOWLEDGE_FIXTURES": fixture_path,
+        "KNOWLEDGE_DB": os.path.join(scratch, "knowledge.sqlite3"),
+        "TTS_CACHE_DIR": os.path.join(scratch, "tts"),
+        "JARVIS_TRACE_LOG": "0",
+        "WHISPER_EAGER_LOAD": "1",
+    })
+    if args.cold:
+        # Every request misses the intent cache and pays for the LLM round-trip
+        os.environ["INTENT_CACHE_TTL"] = "0"
+
+
+def run_benchmark(args):
+    clips = load_corpus(args.corpus)
+    scratch = tempfile.mkdtemp(prefix="jarvis-bench-")
+    configure_environment(args, scratch)
+
+    fake = FakeLLM(latency=args.llm_latency, jitter=args.llm_jitter, token_delay=args.token_delay)
+    os.environ["LLM_BASE_URL"] = fake.start()
+    stub_side_effects()
+
+    import metrics
+    import app as jarvis
+    traces = []
+    metrics.TRACE_SINKS.append(traces.append)
+
+    local = threading.local()
+
+    def send(clip):
+        name, data = clip
+        if not hasattr(local, "client"):
+            local.client = jarvis.app.test_client()
+        started = time.perf_counter()
+        response = local.client.post("/voice", data={"audio": (io.BytesIO(data), name, "audio/wav")},
+                                     content_type="multipart/form-data")
+        elapsed = (time.perf_counter() - started) * 1000
+        body = response.get_json(silent=True) or {}
+        return elapsed, response.status_code, body.get("heard", "")
+
+    # Warm-up: one pass over the corpus so lazy imports and first-call costs don't skew the numbers
+    if args.warmup:
+        for clip in clips:
+            send(clip)
+    traces.clear()
+
+    schedule = [clips[position % len(clips)] for position in range(args.requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(send, schedule))
+    wall_seconds = time.perf_counter() - started
+    fake.stop()
+
+    stages, tools = {}, {}
+    for trace in traces:
+        # A stage can occur several times in one request (e.g. two tools); count its total per request
+        per_request = {}
+        for entry in trace["spans"]:
+            if entry["stage"] == "tool":
+                tools.setdefault(entry["tool"], []).append(entry["ms"])
+            else:
+                per_request[entry["stage"]] = per_request.get(entry["stage"], 0.0) + entry["ms"]
+        for stage, ms in per_request.items():
+            stages.setdefault(stage, []).append(ms)
+
+    statuses = {}
+    for _, status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    return {
+        "config": {
+            "corpus": os.path.abspath(args.corpus),
+            "clips": len(clips),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cold": args.cold,
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "token_delay": args.token_delay,
+        },
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "whisper": jarvis.scheduler.stats(),
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(outcomes) / wall_seconds, 3) if wall_seconds else 0.0,
+        "statuses": statuses,
+        "heard_nothing": sum(1 for _, status, heard in outcomes if status == 200 and not heard),
+        "end_to_end_ms": percentiles([elapsed for elapsed, _, _ in outcomes]),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "tools_ms": {tool: percentiles(values) for tool, values in sorted(tools.items())},
+        "llm_requests": dict(fake.counts),
+    }
+
+
+def print_summary(results):
+    print(f"{results['config']['requests']} requests at concurrency {results['config']['concurrency']}: "
+          f"{results['throughput_rps']} req/s, statuses {results['statuses']}")
+    rows = [("end_to_end", results["end_to_end_ms"])] + list(results["stages_ms"].items())
+    rows += [(f"tool:{tool}", values) for tool, values in results["tools_ms"].items()]
+    print(f"{'stage':<28}{'count':>7}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES))
+    for name, values in rows:
+        print(f"{name:<28}{values.get('count', 0):>7}" + "".join(f"{values.get(f'p{p}', 0):>10.1f}" for p in PERCENTILES))
+
+
+def compare(baseline, current, tolerance, min_delta_ms=5.0):
+    """Prints p50/p95 changes per stage; returns the names of stages whose p95 regressed."""
+    regressions = []
+    rows = [("end_to_end", baseline["end_to_end_ms"], current["end_to_end_ms"])]
+    rows += [(stage, values, current["stages_ms"].get(stage, {})) for stage, values in baseline["stages_ms"].items()]
+    print(f"{'stage':<28}{'p50 base':>10}{'p50 now':>10}{'p95 base':>10}{'p95 now':>10}{'change':>9}")
+    for name, before, after in rows:
+        if not before or not after:
+            continue
+        change = (after["p95"] - before["p95"]) / before["p95"] if before["p95"] else 0.0
+        flag = ""
+        if change > tolerance and after["p95"] - before["p95"] > min_delta_ms:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28}{before['p50']:>10.1f}{after['p50']:>10.1f}{before['p95']:>10.1f}{after['p95']:>10.1f}"
+              f"{change:>+9.0%}{flag}")
+    print(f"Throughput: {baseline['throughput_rps']} -> {current['throughput_rps']} req/s")
+    if current["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append("throughput")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark for the /voice path.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    corpus_command = commands.add_parser("corpus", help="Synthesize the default command clips into a directory.")
+    corpus_command.add_argument("directory")
+
+    run_command = commands.add_parser("run", help="Run the benchmark against a corpus directory.")
+    run_command.add_argument("corpus")
+    run_command.add_argument("--concurrency", type=int, default=4)
+    run_command.add_argument("--requests", type=int, default=50)
+    run_command.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM seconds to first byte.")
+    run_command.add_argument("--llm-jitter", type=float, default=0.05)
+    run_command.add_argument("--token-delay", type=float, default=0.02)
+    run_command.add_argument("--cold", action="store_true", help="Disable the intent cache.")
+    run_command.add_argument("--no-warmup", dest="warmup", action="store_false")
+    run_command.add_argument("--output", help="Write the results as JSON.")
+
+    compare_command = commands.add_parser("compare", help="Compare two result files; exit 1 on regression.")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current")
+    compare_command.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative p95 increase.")
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        build_corpus(args.directory, DEFAULT_COMMANDS)
+    elif args.command == "run":
+        results = run_benchmark(args)
+        print_summary(results)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions:
+            print(f"Regressed: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,170 @@
+import argparse                                             # Command line for running it standalone
+import json                                                 # Request/response bodies and script files
+import random                                               # Latency jitter (seeded, so runs are repeatable)
+import threading                                            # Serve in the background of bench.py
+import time                                                 # Simulated latency
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer   # No dependencies beyond the standard library
+
+#  FAKE OPENAI-COMPATIBLE LLM
+# A local stand-in for Groq's /chat/completions, used by bench.py so the /voice path
+# can be measured offline and without network noise. Replies are scripted: the first
+# rule whose "match" text occurs in the user's message decides the answer.
+#   {"match": "turing", "tool_calls": [{"name": "get_wikipedia", "arguments": {"q": "Alan Turing"}}],
+#    "followup": "Alan Turing was a British mathematician."}
+#   {"match": "", "content": "Certainly."}                 <- catch-all
+# "followup" is the answer to the second call (after the tool results were sent back).
+# Latency is added before the first byte, and between words when streaming.
+#
+#   python fake_llm.py --port 8001 --latency 0.3
+#   LLM_BASE_URL=http://127.0.0.1:8001/v1 python app.py
+
+DEFAULT_SCRIPT = [
+    {"match": "turing", "tool_calls": [{"name": "get_wikipedia", "arguments": {"q": "Alan Turing"}}],
+     "followup": "Alan Turing was an English mathematician and a founder of computer science."},
+    {"match": "spotify", "tool_calls": [{"name": "open_application", "arguments": {"app_name": "spotify"}},
+                                        {"name": "volume_control", "arguments": {"action": "up"}}]},
+    {"match": "weather", "tool_calls": [{"name": "search_google", "arguments": {"query": "weather in paris"}}]},
+    {"match": "moon", "content": "The Moon is about 384,400 kilometres from Earth on average."},
+    {"match": "haiku", "content": "Dark roast in the cup. Steam curls into morning light. The day starts to hum."},
+    {"match": "", "content": "Certainly. Is there anything else I can do for you?"},
+]
+
+
+class FakeLLM:
+    def __init__(self, script=None, latency=0.3, jitter=0.05, token_delay=0.02, host="127.0.0.1", port=0, seed=0):
+        self.script = script or DEFAULT_SCRIPT
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "tool_call_replies": 0, "streamed": 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-llm", daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reply(self, body):
+        """Returns (content, tool_calls) for a chat completion request body."""
+        messages = body.get("messages", [])
+        user_text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "").lower()
+        rule = next((rule for rule in self.script if rule.get("match", "").lower() in user_text), {})
+
+        # Second call: the tool results of *this* turn follow the last user message
+        # (earlier turns of a session can contain tool messages too)
+        last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+        if any(message.get("role") == "tool" for message in messages[last_user + 1:]):
+            return rule.get("followup", "Done."), []
+        if rule.get("tool_calls") and body.get("tools"):
+            calls = [
+                {"id": f"call_{index}", "type": "function",
+                 "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                for index, call in enumerate(rule["tool_calls"])
+            ]
+            return None, calls
+        return rule.get("content", "Done."), []
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency + jitter))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass  # Keep benchmark output readable
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                content, tool_calls = fake.reply(body)
+                with fake.lock:
+                    fake.counts["requests"] += 1
+                    fake.counts["tool_call_replies"] += bool(tool_calls)
+                    fake.counts["streamed"] += bool(body.get("stream"))
+                fake.delay()
+                if body.get("stream"):
+                    self.stream(body, content, tool_calls)
+                else:
+                    self.complete(body, content, tool_calls)
+
+            def envelope(self, body, kind, choice):
+                return {"id": "chatcmpl-fake", "object": kind, "created": int(time.time()),
+                        "model": body.get("model", "fake"), "choices": [choice]}
+
+            def complete(self, body, content, tool_calls):
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                payload = self.envelope(body, "chat.completion", {
+                    "index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"
+                })
+                payload["usage"] = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self, body, content, tool_calls):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                def send(delta, finish_reason=None):
+                    chunk = self.envelope(body, "chat.completion.chunk",
+                                          {"index": 0, "delta": delta, "finish_reason": finish_reason})
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+
+                send({"role": "assistant", "content": ""})
+                if tool_calls:
+                    for index, call in enumerate(tool_calls):
+                        send({"tool_calls": [{"index": index, **call}]})
+                else:
+                    for word in (content or "").split(" "):
+                        time.sleep(fake.token_delay)
+                        send({"content": word + " "})
+                send({}, "tool_calls" if tool_calls else "stop")
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible server with scripted replies.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first byte.")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between streamed words.")
+    parser.add_argument("--script", help="JSON file with a list of reply rules (see the top of this file).")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            script = json.load(f)
+    fake = FakeLLM(script, args.latency, args.jitter, args.token_delay, args.host, args.port)
+    print(f"Fake LLM listening on {fake.base_url}")
+    fake.server.serve_forever()
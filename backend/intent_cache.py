@@ -0,0 +1,83 @@
+import threading                                            # The cache is shared by all request threads
+import time                                                 # Per-entry expiry
+from collections import OrderedDict                         # Insertion order doubles as LRU order
+from intent_matcher import normalize                        # Same normalization as the local fast-path
+
+#  INTENT RESPONSE CACHE
+# People repeat the same questions and commands all the time. This cache stores
+# what the LLM decided for a given (normalized) transcript: either the chat answer
+# or the tool calls it chose. Only the *resolution* is reused; tool calls from a
+# cache hit are executed again every time. Tools with live results or side effects
+# are never cached (see cacheable= on the tool declarations).
+
+
+class IntentCache:
+    def __init__(self, max_entries=512, ttl=3600, similarity=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Optional near-duplicate matching: minimum token Jaccard similarity (e.g. 0.9), None to disable
+        self.similarity = similarity
+        self.entries = OrderedDict()   # key -> (expires_at, tokens, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text):
+        key = normalize(text)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                del self.entries[key]
+
+            if self.similarity:
+                found = self._nearest(set(key.split()), now)
+                if found:
+                    self.entries.move_to_end(found)
+                    self.near_hits += 1
+                    return self.entries[found][2]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, value):
+        key = normalize(text)
+        if not key:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, frozenset(key.split()), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _nearest(self, tokens, now):
+        # Linear scan is fine for a few hundred short entries, and only runs on exact-key misses
+        best_key, best_score = None, 0.0
+        for key, (expires_at, entry_tokens, value) in self.entries.items():
+            if expires_at <= now or not tokens or not entry_tokens:
+                continue
+            score = len(tokens & entry_tokens) / len(tokens | entry_tokens)
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key if best_score >= self.similarity else None
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,221 @@
+import math                                                 # Vector norms for cosine similarity
+import re                                                   # Keyword/pattern rules and text normalization
+import threading                                            # Counters are updated from many request threads
+from collections import Counter                             # Character n-gram term frequencies
+
+#  LOCAL INTENT FAST-PATH
+# Most utterances are short, predictable commands ("volume up", "what time is it").
+# Sending those to the LLM costs two network round-trips before TTS can start.
+# This matcher resolves them locally in two stages:
+#   1. Pattern rules with argument extraction (confidence 1.0)
+#   2. A character n-gram classifier over example phrases, for argument-free commands
+# Anything below the confidence threshold falls back to the LLM as before.
+
+# Filler words Whisper often picks up around a command
+_LEADING_FILLER = re.compile(r"^(?:(?:hey|ok|okay)\s+)?(?:jarvis\s+)?(?:(?:please|can you|could you|would you)\s+)*")
+_TRAILING_FILLER = re.compile(r"\s+(?:please|now|for me|jarvis)$")
+
+# The same filler on the original text, for free-form arguments that must keep their case and punctuation
+_RAW_LEADING_FILLER = re.compile(r"^(?:(?:hey|ok|okay)[\s,]+)?(?:jarvis[\s,.!]+)?(?:(?:please|can you|could you|would you)[\s,]+)*", re.I)
+_RAW_TRAILING_FILLER = re.compile(r"[\s,]+(?:please|now|for me|jarvis)[\s.!?]*$", re.I)
+
+# Utterances that mention a command without asking for it: "don't lock the screen", "type of music
+# do you like?", "Google is a good company right?". Checked (on normalized text) before the
+# classifier and before the rules that act on free-form text; see is_command().
+_NEGATION = re.compile(r"\b(?:don't|dont|do not|never)\b")
+_YES_NO_QUESTION = re.compile(r"^(?:is|are|was|were|do|does|did|can|could|should|will|have|has)\b")
+_WH_QUESTION = re.compile(r"^(?:what|what's|who|who's|why|how|when|where|which)\b")
+# The command word used as a noun or as the subject of a sentence
+_NOUN_USE = re.compile(r"^(?:type|search|google)(?: google)? (?:of|is|are|was|were|has|have|does|do|did|can|will)\b")
+
+# Rules whose free-form argument would be typed or searched as-is, so a false match has side effects
+FREE_FORM_TOOLS = {"type_text", "search_google"}
+
+# Sites we can open without asking the LLM for a URL
+KNOWN_SITES = {
+    "youtube": "https://youtube.com",
+    "google": "https://google.com",
+    "gmail": "https://mail.google.com",
+    "github": "https://github.com",
+    "netflix": "https://netflix.com",
+    "chatgpt": "https://chat.openai.com",
+    "wikipedia": "https://wikipedia.org",
+    "reddit": "https://reddit.com",
+    "amazon": "https://amazon.com",
+    "twitter": "https://twitter.com",
+    "linkedin": "https://linkedin.com",
+    "stack overflow": "https://stackoverflow.com",
+}
+
+# Example phrases for the n-gram classifier: (tool name, arguments) -> phrases.
+# Only commands without free-form arguments belong here; shutdown/restart are deliberately
+# left out so a fuzzy match can never power off the machine.
+EXAMPLES = {
+    ("get_time", ()): ["what time is it", "what is the time", "tell me the time", "current time", "what's the time now"],
+    ("get_date", ()): ["what is the date", "what's the date today", "what's today's date", "what day is it today", "today's date", "tell me the date"],
+    ("tell_joke", ()): ["tell me a joke", "say something funny", "make me laugh", "tell a joke", "got any jokes"],
+    ("lock_screen", ()): ["lock the screen", "lock my computer", "lock the computer", "lock screen"],
+    ("wake_screen", ()): ["wake the screen", "wake up the screen", "turn on the display", "wake up the display"],
+    ("volume_control", (("action", "up"),)): ["volume up", "turn the volume up", "increase the volume", "louder", "turn it up"],
+    ("volume_control", (("action", "down"),)): ["volume down", "turn the volume down", "decrease the volume", "quieter", "turn it down"],
+    ("volume_control", (("action", "mute"),)): ["mute", "mute the volume", "mute the sound", "silence the audio"],
+    ("media_control", (("action", "nexttrack"),)): ["next song", "next track", "skip this song", "play the next song"],
+    ("media_control", (("action", "prevtrack"),)): ["previous song", "previous track", "go back a song", "play the last song"],
+    ("media_control", (("action", "playpause"),)): ["pause the music", "resume the music", "play the music", "pause", "play pause"],
+}
+
+
+def normalize(text):
+    """Lowercases, strips punctuation and polite filler so rules and examples match more often."""
+    text = text.lower().strip()
+    text = re.sub(r"[^\w\s'.]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip(" .")
+    text = _LEADING_FILLER.sub("", text)
+    text = _TRAILING_FILLER.sub("", text)
+    return text.strip()
+
+
+def strip_filler(text, trailing=True):
+    """Removes leading (and optionally trailing) filler but keeps the words as spoken; used for arguments."""
+    text = _RAW_LEADING_FILLER.sub("", text.strip())
+    if trailing:
+        text = _RAW_TRAILING_FILLER.sub("", text).rstrip(" .!?")
+    return text.strip()
+
+
+def is_command(text, original, questions=True):
+    """
+    False when the utterance negates a command or talks about it instead of asking for it.
+    text is the normalized utterance, original the words as spoken. With questions=False,
+    wh-questions and a trailing "?" are allowed, since "what's the time?" is how get_time is asked.
+    """
+    if _NEGATION.search(text) or _YES_NO_QUESTION.match(text) or _NOUN_USE.match(text):
+        return False
+    if questions and (_WH_QUESTION.match(text) or original.rstrip().endswith("?")):
+        return False
+    return True
+
+
+def _ngrams(text, n=3):
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def _cosine(a, a_norm, b, b_norm):
+    if not a_norm or not b_norm:
+        return 0.0
+    shared = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    return shared / (a_norm * b_norm)
+
+
+class IntentMatcher:
+    def __init__(self, app_names, threshold=0.8):
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.tool_hits = Counter()
+
+        apps = "|".join(re.escape(name) for name in sorted(app_names, key=len, reverse=True))
+        sites = "|".join(re.escape(name) for name in sorted(KNOWN_SITES, key=len, reverse=True))
+
+        # (tool name, pattern, function turning the match into arguments, pattern for the original text).
+        # Rules match on normalized text; rules with free-form arguments match again on the original
+        # text so "Type Hello, World!" types exactly that. For those, trailing filler is only stripped
+        # from search queries: "type I'll be there now" must keep its "now".
+        self.rules = [
+            ("open_application", re.compile(rf"^(?:open|launch|start) (?:the )?({apps})(?: app| application)?$"),
+                lambda m: {"app_name": m.group(1)}, None),
+            ("open_website", re.compile(rf"^(?:open|go to|launch) ({sites})(?: website| site)?$"),
+                lambda m: {"url": KNOWN_SITES[m.group(1)]}, None),
+            ("open_website", re.compile(r"^(?:open|go to) ((?:www\.)?[a-z0-9-]+\.(?:com|org|net|io|dev|in|co))$"),
+                lambda m: {"url": f"https://{m.group(1)}"}, None),
+            ("get_wikipedia", re.compile(r"^(?:search )?wikipedia (?:for )?(.+)$|^look up (.+?) on wikipedia$"),
+                lambda m: {"q": m.group(1) or m.group(2)},
+                (re.compile(r"^(?:search )?wikipedia,? (?:for )?(.+)$|^look up (.+?) on wikipedia$", re.I | re.S), True)),
+            ("search_google", re.compile(r"^(?:search|google)(?: google)?(?: for)? (.+)$"),
+                lambda m: {"query": m.group(1)},
+                (re.compile(r"^(?:search|google)(?: google)?(?: for)?[,:]? (.+)$", re.I | re.S), True)),
+            ("type_text", re.compile(r"^type (?:out )?(.+)$"),
+                lambda m: {"text": m.group(1)},
+                (re.compile(r"^type(?: out)?[,:]? (.+)$", re.I | re.S), False)),
+            ("shutdown_system", re.compile(r"^(?:shut ?down|power off|turn off) (?:the |my )?(?:computer|system|pc)$"),
+                lambda m: {}, None),
+            ("restart_system", re.compile(r"^(?:restart|reboot) (?:the |my )?(?:computer|system|pc)$"),
+                lambda m: {}, None),
+        ]
+
+        # Pre-compute n-gram vectors once; matching is then a handful of dict operations
+        self.examples = []
+        for (tool, args), phrases in EXAMPLES.items():
+            for phrase in phrases:
+                vector = _ngrams(phrase)
+                self.examples.append((tool, dict(args), vector, math.sqrt(sum(c * c for c in vector.values()))))
+
+    def match(self, user_text):
+        """
+        Returns {"tool", "args", "confidence", "source"} for a confident local match,
+        or None when the utterance should go to the LLM.
+        """
+        text = normalize(user_text)
+        result = self._match_rules(text, user_text) or self._match_examples(text, user_text)
+
+        with self.lock:
+            self.counts["total"] += 1
+            if result is None:
+                self.counts["fallback"] += 1
+            else:
+                self.counts[f"{result['source']}_hits"] += 1
+                self.tool_hits[result["tool"]] += 1
+        return result
+
+    def _match_rules(self, text, original):
+        for tool, pattern, make_args, raw in self.rules:
+            found = pattern.match(text)
+            if not found:
+                continue
+            if tool in FREE_FORM_TOOLS and not is_command(text, original):
+                return None
+            if raw:
+                # Same rule on the original wording; keep the normalized arguments if it doesn't line up
+                raw_pattern, trailing = raw
+                found = raw_pattern.match(strip_filler(original, trailing)) or found
+            return {"tool": tool, "args": make_args(found), "confidence": 1.0, "source": "rule"}
+        return None
+
+    def _match_examples(self, text, original):
+        # Long sentences are questions/conversation, not commands; don't even try. Negations and
+        # yes/no questions look just like the command to an n-gram vector, so they are ruled out first.
+        if not text or len(text.split()) > 8 or not is_command(text, original, questions=False):
+            return None
+        vector = _ngrams(text)
+        norm = math.sqrt(sum(c * c for c in vector.values()))
+
+        best_score, best = 0.0, None
+        for tool, args, example, example_norm in self.examples:
+            score = _cosine(vector, norm, example, example_norm)
+            if score > best_score:
+                best_score, best = score, (tool, args)
+
+        with self.lock:
+            # Keep the near misses visible so the threshold can be tuned
+            if best and best_score < self.threshold:
+                self.counts["below_threshold"] += 1
+
+        if best is None or best_score < self.threshold:
+            return None
+        return {"tool": best[0], "args": dict(best[1]), "confidence": round(best_score, 3), "source": "classifier"}
+
+    def stats(self):
+        with self.lock:
+            total = self.counts["total"]
+            hits = self.counts["rule_hits"] + self.counts["classifier_hits"]
+            return {
+                "threshold": self.threshold,
+                "total": total,
+                "rule_hits": self.counts["rule_hits"],
+                "classifier_hits": self.counts["classifier_hits"],
+                "fallback": self.counts["fallback"],
+                "below_threshold": self.counts["below_threshold"],
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "tool_hits": dict(self.tool_hits),
+            }
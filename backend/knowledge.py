@@ -0,0 +1,213 @@
+import argparse                                             # Command line for warm-up and manual lookups
+import json                                                 # Fixture files
+import os                                                   # Paths and environment-based configuration
+import re                                                   # Query normalization
+import sqlite3                                              # Local persistent cache
+import sys                                                  # Read warm-up topics from stdin
+import threading                                            # One connection shared by request threads
+import time                                                 # TTLs
+from concurrent.futures import ThreadPoolExecutor          # Parallel warm-up
+
+#  KNOWLEDGE LOOKUPS
+# get_wikipedia used to call wikipedia.summary() on every request. Lookups now go
+# through a local SQLite cache of normalized query -> summary:
+#   - hits are served from disk in well under a millisecond
+#   - misses and disambiguation pages are cached too (with a shorter TTL), so a bad
+#     query doesn't hit the network every time it is repeated
+#   - the backend is pluggable: Wikipedia in production, a JSON fixture file in tests
+#     and offline deployments
+# Popular topics can be preloaded with:  python knowledge.py warm topics.txt
+
+OK, MISSING, AMBIGUOUS = "ok", "missing", "ambiguous"
+
+
+def normalize_query(query):
+    """The cache key: case and spacing don't matter, but "+", "#" and "&" do ("C++" vs "C#", "AT&T")."""
+    query = re.sub(r"[^\w\s'+#&-]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip()
+
+
+class _TimeoutSession:
+    """
+    Stands in for the requests module inside the wikipedia package, which calls requests.get()
+    without a timeout: a hung lookup would hold its tool thread forever. Also reuses connections.
+    """
+
+    def __init__(self, timeout):
+        import requests                                     # Installed with the wikipedia package
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+
+class WikipediaBackend:
+    """Live lookups through the wikipedia package, with an HTTP timeout (seconds) on every request."""
+
+    def __init__(self, sentences=2, timeout=3.0):
+        self.sentences = sentences
+        self.timeout = timeout
+        self.wikipedia = None
+
+    def lookup(self, query):
+        """Returns (status, content): the summary, None, or a list of options for ambiguous queries."""
+        if self.wikipedia is None:
+            import wikipedia                                # Imported on first lookup, not at startup
+            wikipedia.wikipedia.requests = _TimeoutSession(self.timeout)
+            self.wikipedia = wikipedia
+        try:
+            return OK, self.wikipedia.summary(query, sentences=self.sentences)
+        except self.wikipedia.exceptions.DisambiguationError as e:
+            return AMBIGUOUS, e.options[:5]
+        except self.wikipedia.exceptions.PageError:
+            return MISSING, None
+
+
+class FixtureBackend:
+    """
+    Offline backend reading a JSON file: {"topic": "summary", "mercury": {"ambiguous": ["Mercury (planet)", ...]}}.
+    Topics not in the file are reported as missing.
+    """
+
+    def __init__(self, path):
+        with open(path, encoding="utf-8") as f:
+            self.entries = {normalize_query(key): value for key, value in json.load(f).items()}
+
+    def lookup(self, query):
+        value = self.entries.get(normalize_query(query))
+        if value is None:
+            return MISSING, None
+        if isinstance(value, dict) and "ambiguous" in value:
+            return AMBIGUOUS, value["ambiguous"]
+        return OK, value
+
+
+class KnowledgeBase:
+    def __init__(self, backend, db_path, ttl=30 * 24 * 3600, negative_ttl=24 * 3600):
+        self.backend = backend
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "negative_hits": 0, "misses": 0, "backend_errors": 0}
+
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS knowledge ("
+            "query TEXT PRIMARY KEY, status TEXT NOT NULL, content TEXT, fetched_at REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def after_fork(self):
+        """SQLite connections must not be shared across fork(); each worker process opens its own."""
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def lookup(self, query):
+        """Returns a sentence for the user; failures start with "Could not" so callers can spot them."""
+        key = normalize_query(query)
+        status, content = self._cached(key)
+        if status is None:
+            # The backend gets the words as asked; the normalized key is only for the cache
+            status, content = self._fetch(key, query.strip())
+        return self._render(query, status, content)
+
+    def warm(self, topics, workers=4):
+        """Preloads topics that aren't cached yet; returns how many ended up in each status."""
+        todo = {}
+        for topic in topics:
+            if topic.strip():
+                todo.setdefault(normalize_query(topic), topic.strip())
+        todo = {key: topic for key, topic in todo.items() if self._cached(key, count=False)[0] is None}
+        summary = {OK: 0, MISSING: 0, AMBIGUOUS: 0, "errors": 0}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for status, content in pool.map(self._fetch_quietly, todo, todo.values()):
+                summary[status or "errors"] += 1
+        return summary
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0]
+            return {"entries": entries, **self.counts}
+
+    def _cached(self, key, count=True):
+        with self.lock:
+            row = self.db.execute("SELECT status, content, fetched_at FROM knowledge WHERE query = ?", (key,)).fetchone()
+            fresh = row and time.time() - row[2] < (self.ttl if row[0] == OK else self.negative_ttl)
+            if count:
+                if not fresh:
+                    self.counts["misses"] += 1
+                elif row[0] == OK:
+                    self.counts["hits"] += 1
+                else:
+                    self.counts["negative_hits"] += 1
+        if not fresh:
+            return None, None
+        status, content = row[0], row[1]
+        return status, json.loads(content) if status == AMBIGUOUS else content
+
+    def _fetch(self, key, query):
+        try:
+            status, content = self.backend.lookup(query)
+        except Exception:
+            # Network problems are not cached: the next request tries again
+            with self.lock:
+                self.counts["backend_errors"] += 1
+            raise
+        stored = json.dumps(content) if status == AMBIGUOUS else content
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO knowledge (query, status, content, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, status, stored, time.time()),
+            )
+            self.db.commit()
+        return status, content
+
+    def _fetch_quietly(self, key, query):
+        try:
+            return self._fetch(key, query)
+        except Exception as e:
+            print(f"[LOG] Warm-up failed for '{query}': {e}")
+            return None, None
+
+    @staticmethod
+    def _render(query, status, content):
+        if status == OK:
+            return content
+        if status == AMBIGUOUS:
+            return f"'{query}' may refer to several things: {', '.join(content)}."
+        return f"Could not find a Wikipedia article about {query}."
+
+
+def knowledge_from_env():
+    """Builds the knowledge base configured by KNOWLEDGE_* environment variables."""
+    fixtures = os.getenv("KNOWLEDGE_FIXTURES")
+    backend = FixtureBackend(fixtures) if fixtures else WikipediaBackend(timeout=float(os.getenv("KNOWLEDGE_HTTP_TIMEOUT", "3")))
+    return KnowledgeBase(
+        backend,
+        db_path=os.getenv("KNOWLEDGE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge.sqlite3")),
+        ttl=float(os.getenv("KNOWLEDGE_TTL", str(30 * 24 * 3600))),
+        negative_ttl=float(os.getenv("KNOWLEDGE_NEGATIVE_TTL", str(24 * 3600))),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JARVIS knowledge cache (configured through KNOWLEDGE_* variables).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm_command = commands.add_parser("warm", help="Preload topics, one per line, from a file ('-' for stdin).")
+    warm_command.add_argument("topics_file")
+    warm_command.add_argument("--workers", type=int, default=4)
+    lookup_command = commands.add_parser("lookup", help="Look up one topic through the cache.")
+    lookup_command.add_argument("query")
+    args = parser.parse_args()
+
+    knowledge = knowledge_from_env()
+    if args.command == "warm":
+        source = sys.stdin if args.topics_file == "-" else open(args.topics_file, encoding="utf-8")
+        with source:
+            print(json.dumps(knowledge.warm(source.read().splitlines(), workers=args.workers)))
+    else:
+        print(knowledge.lookup(args.query))
+    print(json.dumps(knowledge.stats()))
@@ -0,0 +1,179 @@
+import bisect                                               # Bucket lookup for histogram observations
+import contextvars                                          # Current request, visible to every stage it calls
+import json                                                 # One structured log line per request
+import os                                                   # Environment-based configuration
+import threading                                            # Histograms are updated from many request threads
+import time                                                 # Span timing
+import uuid                                                 # Request IDs
+from contextlib import contextmanager                       # span() / tool_span()
+
+#  TIMING SPANS AND METRICS
+# Every request gets an ID and a list of spans, one per pipeline stage (decode,
+# transcribe, intent match, LLM calls, tools, TTS). When the request ends the spans
+# are written as a single JSON log line, so a slow request shows where its time went.
+# The same timings feed Prometheus histograms served on /metrics.
+# A span costs two perf_counter() calls and a short locked update: cheap enough to leave on.
+# Everything here lives in the process that served the request. Under serve.py each
+# worker has its own histograms and counters, and a scrape of /metrics is answered by
+# whichever worker accepts it, so it reports that worker only (its pid is in
+# jarvis_worker_info). Run a single worker with more --threads when exact metrics matter.
+
+# Seconds; covers a 5 ms cache hit up to a slow 30 s transcription
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# JARVIS_TRACE_LOG=0 turns the per-request JSON lines off (metrics are still collected)
+TRACE_LOG = os.getenv("JARVIS_TRACE_LOG", "1") != "0"
+
+# Extra consumers of finished traces (e.g. bench.py); each is called with the log record dict
+TRACE_SINKS = []
+
+
+class Histogram:
+    """Prometheus-style histogram with one label (stage, tool...)."""
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self.series = {}          # label value -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, seconds):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            cumulative += values[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        with self.lock:
+            samples = [(dict(zip(self.labels, key)), value) for key, value in sorted(self.values.items())]
+        return render_samples(self.name, "counter", self.help_text, samples)
+
+
+STAGE_SECONDS = Histogram("jarvis_stage_seconds", "Time spent in each pipeline stage.", "stage")
+TOOL_SECONDS = Histogram("jarvis_tool_seconds", "Execution time of each tool.", "tool")
+REQUESTS = Counter("jarvis_requests_total", "Finished requests by route and status code.", ("route", "status"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_samples(name, kind, help_text, samples):
+    """Exposition lines for a gauge or counter; samples are (labels dict, value) pairs."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+#  REQUEST TRACES
+
+class Trace:
+    def __init__(self, route, request_id=None):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def finish(self, status):
+        total = time.perf_counter() - self.started
+        STAGE_SECONDS.observe("request", total)
+        REQUESTS.inc(self.route, str(status))
+        record = {
+            "event": "request",
+            "request_id": self.request_id,
+            "route": self.route,
+            "status": status,
+            "total_ms": round(total * 1000, 2),
+            "spans": self.spans,
+        }
+        if TRACE_LOG:
+            print(json.dumps(record), flush=True)
+        for sink in TRACE_SINKS:
+            sink(record)
+
+
+_current = contextvars.ContextVar("jarvis_trace", default=None)
+
+
+def begin_request(route, request_id=None):
+    """Starts a trace for the current request (thread or asyncio task); returns it."""
+    trace = Trace(route, request_id)
+    _current.set(trace)
+    return trace
+
+
+def end_request(status):
+    trace = _current.get()
+    if trace is not None:
+        _current.set(None)
+        trace.finish(status)
+
+
+def current_request_id():
+    trace = _current.get()
+    return trace.request_id if trace else None
+
+
+def _record(histogram, label_value, seconds, span):
+    histogram.observe(label_value, seconds)
+    trace = _current.get()
+    if trace is not None:
+        span["ms"] = round(seconds * 1000, 2)
+        trace.spans.append(span)
+
+
+@contextmanager
+def span(stage, **fields):
+    """Times a block as one pipeline stage; extra fields are added to the JSON log entry."""
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        _record(STAGE_SECONDS, stage, time.perf_counter() - started, {"stage": stage, **fields})
+
+
+@contextmanager
+def tool_span(tool):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(TOOL_SECONDS, tool, time.perf_counter() - started, {"stage": "tool", "tool": tool})
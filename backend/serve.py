@@ -0,0 +1,128 @@
+import argparse                                             # Command line options
+import multiprocessing                                      # The model server process
+import os                                                   # Socket path and environment for the workers
+import tempfile                                             # Private directory for the model server socket
+import threading                                            # Watches the model server process
+from transcription import serve_model                       # Model server entry point
+
+#  PRODUCTION SERVER
+# `python app.py` runs Werkzeug's development server. This runs the same app under
+# gunicorn instead:
+#   - one model server process loads Faster-Whisper once and serves transcriptions
+#     over a Unix socket (transcription.SchedulerServer)
+#   - the gunicorn master imports app.py once (preload) and forks the web workers,
+#     which share that memory copy-on-write and reach the model through RemoteScheduler
+#   - debug is off; each worker runs --threads request threads (websockets included)
+#   - the model server is watched and restarted if it dies; meanwhile the workers report
+#     not ready on /readyz and answer transcriptions with 503 + Retry-After
+#   - the TTS engine is started in each worker after the fork, never in the master
+#   - conversation sessions (SQLite) and cached TTS audio (one directory) are shared, so a
+#     follow-up or a /tts download can land on any worker
+#   - /metrics, /stats and the request histograms are per worker: a scrape reports the
+#     worker that answered it (jarvis_worker_info{pid}); use --workers 1 with more
+#     --threads when exact counts matter
+#
+#   python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+
+def build_application(options):
+    # gunicorn is Unix-only and imported here so that app.py doesn't depend on it
+    from gunicorn.app.base import BaseApplication
+
+    class JarvisApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import app
+            return app.app
+
+    return JarvisApplication()
+
+
+class ModelServerSupervisor:
+    """Runs the model server in a child process and starts a new one whenever it exits."""
+
+    def __init__(self, address, model_size, interval=2.0):
+        self.address = address
+        self.model_size = model_size
+        self.interval = interval
+        self.process = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.process = self._spawn()
+        threading.Thread(target=self._watch, name="whisper-supervisor", daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.process is not None:
+            self.process.terminate()
+
+    def _spawn(self):
+        # A fresh interpreter, never a fork: restarts happen in the gunicorn master, and a forked
+        # child would inherit its listening socket, its signal handlers (so terminate() wouldn't
+        # stop it), this watcher thread and the preloaded app's SQLite connections
+        process = multiprocessing.get_context("spawn").Process(
+            target=serve_model, args=(self.address, self.model_size), name="whisper-server", daemon=True
+        )
+        process.start()
+        return process
+
+    def _alive(self):
+        if self.process.exitcode is not None:
+            return False
+        # The gunicorn master reaps every child it doesn't know (waitpid(-1)), which hides the
+        # exit code from multiprocessing; a reaped process no longer exists for kill(pid, 0)
+        try:
+            os.kill(self.process.pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def _watch(self):
+        while not self.stopped.wait(self.interval):
+            if not self._alive():
+                print(f"[LOG] Speech model server (pid {self.process.pid}) exited; starting a new one.")
+                self.process = self._spawn()
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run JARVIS with gunicorn and a shared speech model server.")
+    parser.add_argument("--bind", default=os.getenv("JARVIS_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JARVIS_WORKERS", "2")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("JARVIS_THREADS", "8")))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("JARVIS_TIMEOUT", "120")),
+                        help="Seconds before gunicorn restarts a silent worker (long websocket sessions need headroom).")
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"))
+    args = parser.parse_args()
+
+    # 1. The model server (a spawned process, see ModelServerSupervisor._spawn) and its watcher
+    address = os.path.join(tempfile.mkdtemp(prefix="jarvis-"), "whisper.sock")
+    model_server = ModelServerSupervisor(address, args.model)
+    model_server.start()
+    os.environ["WHISPER_SERVER"] = address
+
+    # 2. gunicorn: the master preloads app.py, then forks the workers
+    try:
+        build_application({
+            "bind": args.bind,
+            "workers": args.workers,
+            "threads": args.threads,
+            "worker_class": "gthread",
+            "timeout": args.timeout,
+            "preload_app": True,
+            "post_fork": post_fork,
+        }).run()
+    finally:
+        model_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import json                                                 # Stored turns/summaries, tool arguments in summaries
+import sqlite3                                              # Shared by every worker process
+import threading                                            # One connection shared by request threads
+import time                                                 # Idle expiry
+from contextlib import contextmanager                       # Write transactions
+
+#  CONVERSATION SESSIONS
+# Follow-ups ("turn it up more", "open the second one") need the previous turns, but the
+# prompt must not grow with the length of the conversation. Each session keeps:
+#   - the last few turns verbatim (user text, tool calls, truncated tool results, reply)
+#   - one-line summaries of older turns, themselves capped
+# and history() trims both until the estimated token count fits the budget.
+# The history is inserted *after* the system prompt, and the tool schema is sent unchanged,
+# so every request starts with the same bytes and provider-side prompt caching keeps working.
+# Sessions live in SQLite (by default the knowledge cache file), so under serve.py a follow-up
+# finds its history whichever worker process it lands on. Each read-modify-write runs in an
+# IMMEDIATE transaction, which serializes concurrent turns of the same session across processes.
+
+
+def estimate_tokens(messages):
+    """Rough token count (about 4 characters per token, plus per-message overhead); no tokenizer needed."""
+    total = 0
+    for message in messages:
+        total += 4 + len(message.get("content") or "") // 4
+        for call in message.get("tool_calls") or []:
+            total += 4 + (len(call["function"]["name"]) + len(call["function"]["arguments"])) // 4
+    return total
+
+
+def _clip(text, limit):
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+class SessionStore:
+    def __init__(self, db_path, max_sessions=1000, idle_ttl=1800, token_budget=600, keep_turns=4,
+                 max_summaries=8, tool_result_chars=200, message_chars=400):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.max_summaries = max_summaries
+        self.tool_result_chars = tool_result_chars
+        self.message_chars = message_chars
+        self.lock = threading.Lock()
+        self.compactions = 0      # In this process
+        self.history_tokens = []  # Recent history sizes in this process, for stats
+
+        self._connect()
+        with self._transaction():
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+
+    def after_fork(self):
+        """SQLite connections must not be shared across fork(); each worker process opens its own."""
+        self.lock = threading.Lock()
+        self._connect()
+
+    def history(self, session_id):
+        """Messages to place between the system prompt and the new user message (empty without a session)."""
+        if not session_id:
+            return []
+        with self._transaction():
+            session = self._get(session_id)
+            if session is None:
+                return []
+            messages = self._render(session)
+            # Over budget: fold the oldest verbatim turns into summaries, then drop the oldest summaries
+            while estimate_tokens(messages) > self.token_budget and (session["turns"] or session["summaries"]):
+                if session["turns"]:
+                    self._compact_oldest(session)
+                else:
+                    session["summaries"].pop(0)
+                messages = self._render(session)
+            self._save(session_id, session)
+            self.history_tokens = (self.history_tokens + [estimate_tokens(messages)])[-100:]
+            return messages
+
+    def record(self, session_id, messages):
+        """Stores one finished turn: the user message, any tool call/result messages and the reply."""
+        if not session_id:
+            return
+        turn = []
+        for message in messages:
+            message = dict(message)
+            limit = self.tool_result_chars if message["role"] == "tool" else self.message_chars
+            if message.get("content"):
+                message["content"] = _clip(message["content"], limit)
+            turn.append(message)
+
+        with self._transaction():
+            session = self._get(session_id)
+            if session is None:
+                session = {"turns": [], "summaries": []}
+            session["turns"].append(turn)
+            while len(session["turns"]) > self.keep_turns:
+                self._compact_oldest(session)
+            self._save(session_id, session)
+            # Idle sessions expire, and the least recently used go first beyond max_sessions
+            self.db.execute("DELETE FROM sessions WHERE last_used < ?", (time.time() - self.idle_ttl,))
+            self.db.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+
+    def stats(self):
+        with self.lock:
+            sessions = self.db.execute(
+                "SELECT COUNT(*) FROM sessions WHERE last_used >= ?", (time.time() - self.idle_ttl,)
+            ).fetchone()[0]
+            return {
+                "sessions": sessions,
+                "token_budget": self.token_budget,
+                "compactions": self.compactions,
+                "avg_history_tokens": round(sum(self.history_tokens) / len(self.history_tokens), 1)
+                if self.history_tokens else 0.0,
+                "max_history_tokens": max(self.history_tokens, default=0),
+            }
+
+    def _connect(self):
+        # Autocommit mode, so _transaction() decides when a write transaction starts;
+        # the timeout is how long a worker waits for another one's transaction to finish
+        self.db = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _get(self, session_id):
+        row = self.db.execute("SELECT data, last_used FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.idle_ttl:
+            self.db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            return None
+        return json.loads(row[0])
+
+    def _save(self, session_id, session):
+        self.db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, last_used) VALUES (?, ?, ?)",
+            (session_id, json.dumps(session), time.time()),
+        )
+
+    def _compact_oldest(self, session):
+        session["summaries"].append(self._summarize(session["turns"].pop(0)))
+        del session["summaries"][:-self.max_summaries]
+        self.compactions += 1
+
+    @staticmethod
+    def _summarize(turn):
+        """One line per turn: what was asked, which tools ran, what was answered."""
+        asked = next((m["content"] for m in turn if m["role"] == "user"), "")
+        actions = [
+            f"{call['function']['name']}({', '.join(f'{k}={v}' for k, v in json.loads(call['function']['arguments'] or '{}').items())})"
+            for m in turn if m["role"] == "assistant" for call in m.get("tool_calls") or []
+        ]
+        answered = next((m["content"] for m in reversed(turn) if m["role"] == "assistant" and m.get("content")), "")
+        line = f"User: {_clip(asked, 80)}"
+        if actions:
+            line += f" | Ran: {_clip('; '.join(actions), 80)}"
+        return line + f" | You: {_clip(answered, 80)}"
+
+    @staticmethod
+    def _render(session):
+        messages = []
+        if session["summaries"]:
+            messages.append({"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(session["summaries"])})
+        for turn in session["turns"]:
+            messages.extend(turn)
+        return messages
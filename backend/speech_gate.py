@@ -0,0 +1,103 @@
+import os                                                   # Environment-based configuration
+import threading                                            # Counters shared by request threads
+import numpy as np                                          # Energy of the decoded samples
+from audio import SAMPLE_RATE                               # Decoded clips are 16 kHz mono float32
+
+#  SPEECH GATE
+# Runs between decoding and Whisper. An empty or silent clip used to cost a full
+# transcription pass just to answer "I heard nothing"; now it is rejected in a few
+# milliseconds:
+#   1. too short:  less audio than anyone can say a command in
+#   2. silent:     RMS energy below a floor (no VAD needed at all)
+#   3. no speech:  Silero VAD finds less speech than min_speech seconds
+# Clips that pass are trimmed to their speech regions (plus a little padding), and long
+# pauses inside them are shortened, so Whisper doesn't decode silence either.
+
+PASS, TOO_SHORT, SILENT, NO_SPEECH = "pass", "too_short", "silent", "no_speech"
+
+
+class SpeechGate:
+    def __init__(self, min_clip=0.3, min_rms=0.003, min_speech=0.2, pad=0.2, max_gap=1.0):
+        self.min_clip = int(min_clip * SAMPLE_RATE)
+        self.min_rms = min_rms
+        self.min_speech = int(min_speech * SAMPLE_RATE)
+        self.pad = int(pad * SAMPLE_RATE)
+        # Pauses longer than this are cut down to 2 * pad
+        self.max_gap = int(max_gap * SAMPLE_RATE)
+        self.vad = None
+        self.lock = threading.Lock()
+        self.decisions = {PASS: 0, TOO_SHORT: 0, SILENT: 0, NO_SPEECH: 0}
+        self.seconds_in = 0.0
+        self.seconds_saved = 0.0
+
+    def check(self, samples):
+        """
+        Returns {"decision", "samples", "rms", "speech_ratio", "saved_seconds"}; "samples" is the
+        trimmed audio for Whisper when the decision is PASS, otherwise None.
+        """
+        result = {"decision": PASS, "samples": None, "rms": 0.0, "speech_ratio": 0.0, "saved_seconds": 0.0}
+        if len(samples) < self.min_clip:
+            return self._count(result, samples, TOO_SHORT)
+
+        result["rms"] = round(float(np.sqrt(np.mean(np.square(samples)))), 5)
+        if result["rms"] < self.min_rms:
+            return self._count(result, samples, SILENT)
+
+        speech = self._speech_timestamps(samples)
+        spoken = sum(region["end"] - region["start"] for region in speech)
+        result["speech_ratio"] = round(spoken / len(samples), 3)
+        if spoken < self.min_speech:
+            return self._count(result, samples, NO_SPEECH)
+
+        # Padded speech regions; neighbours closer than max_gap are merged so short pauses stay intact
+        regions = []
+        for region in speech:
+            start, end = max(0, region["start"] - self.pad), min(len(samples), region["end"] + self.pad)
+            if regions and start - regions[-1][1] <= self.max_gap:
+                regions[-1][1] = max(regions[-1][1], end)
+            else:
+                regions.append([start, end])
+        result["samples"] = np.concatenate([samples[start:end] for start, end in regions])
+        return self._count(result, samples, PASS, kept=len(result["samples"]))
+
+    def stats(self):
+        with self.lock:
+            total = sum(self.decisions.values())
+            return {
+                "clips": total,
+                **self.decisions,
+                "rejected_rate": round((total - self.decisions[PASS]) / total, 3) if total else 0.0,
+                "audio_seconds_in": round(self.seconds_in, 3),
+                "audio_seconds_saved": round(self.seconds_saved, 3),
+            }
+
+    def _speech_timestamps(self, samples):
+        if self.vad is None:
+            # Silero VAD ships with faster-whisper; imported on first use like the model itself
+            from faster_whisper.vad import VadOptions, get_speech_timestamps
+            self.vad = (get_speech_timestamps, VadOptions(min_silence_duration_ms=300, speech_pad_ms=0))
+        get_speech_timestamps, options = self.vad
+        return get_speech_timestamps(samples, options)
+
+    def _count(self, result, samples, decision, kept=0):
+        saved = (len(samples) - kept) / SAMPLE_RATE
+        result["decision"] = decision
+        result["saved_seconds"] = round(saved, 3)
+        with self.lock:
+            self.decisions[decision] += 1
+            self.seconds_in += len(samples) / SAMPLE_RATE
+            self.seconds_saved += saved
+        return result
+
+
+def speech_gate_from_env():
+    """The gate configured by SPEECH_GATE_* variables, or None when SPEECH_GATE=0."""
+    if os.getenv("SPEECH_GATE", "1") == "0":
+        return None
+    return SpeechGate(
+        min_clip=float(os.getenv("SPEECH_GATE_MIN_CLIP", "0.3")),
+        min_rms=float(os.getenv("SPEECH_GATE_MIN_RMS", "0.003")),
+        min_speech=float(os.getenv("SPEECH_GATE_MIN_SPEECH", "0.2")),
+        pad=float(os.getenv("SPEECH_GATE_PAD", "0.2")),
+        max_gap=float(os.getenv("SPEECH_GATE_MAX_GAP", "1.0")),
+    )
@@ -0,0 +1,191 @@
+import re                                                   # Sentence boundaries in streamed LLM output
+import numpy as np                                          # Rolling float32 sample buffer
+from audio import SAMPLE_RATE, decode_audio, pcm16_to_float32       # Shared in-memory decoders
+
+#  STREAMING TRANSCRIPTION
+# The browser sends audio while the user is still talking. We keep a rolling
+# buffer, re-transcribe the current utterance every few hundred milliseconds
+# (partial results), and use VAD to spot the end of speech. As soon as enough
+# trailing silence is seen, the utterance is transcribed one last time (final
+# result) and the buffer moves on to the next utterance.
+# On the way back, SentenceSplitter lets the reply be spoken sentence by sentence
+# while the LLM is still generating the rest of it.
+
+
+# Matroska/WebM Cluster element ID; a decoder can (re)start reading at any cluster
+_WEBM_CLUSTER = b"\x1f\x43\xb6\x75"
+
+
+class StreamDecoder:
+    """
+    Turns incoming websocket chunks into 16 kHz float32 samples.
+    'pcm16' chunks are independent and decoded directly. MediaRecorder 'webm'
+    chunks are only decodable together with the container header from the first
+    chunk, so we keep the header plus a window of recent bytes and hand back only
+    the newly decoded samples. Once the window grows past max_window_bytes it is cut
+    back to the last cluster start, so each chunk costs a bounded decode instead of
+    re-decoding everything since the stream opened.
+    """
+
+    def __init__(self, audio_format="pcm16", sample_rate=SAMPLE_RATE, max_window_bytes=64 * 1024):
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate
+        self.max_window_bytes = max_window_bytes
+        self.header = None        # EBML header, segment info and tracks: everything before the first cluster
+        self.window = bytearray()  # Clusters not yet dropped, starting at a cluster boundary
+        self.samples_emitted = 0  # Samples already returned from the current window
+
+    def decode(self, chunk):
+        if self.audio_format == "pcm16":
+            return pcm16_to_float32(chunk, sample_rate=self.sample_rate)
+
+        self.window.extend(chunk)
+        if self.header is None:
+            start = self.window.find(_WEBM_CLUSTER)
+            if start < 0:
+                return np.zeros(0, dtype=np.float32)
+            self.header = bytes(self.window[:start])
+            del self.window[:start]
+
+        samples = self._decode(self.window)
+        if samples is None:
+            # A chunk can end in the middle of a cluster; wait for more bytes
+            return np.zeros(0, dtype=np.float32)
+        new_samples = samples[self.samples_emitted:]
+        self.samples_emitted = len(samples)
+
+        if len(self.window) > self.max_window_bytes:
+            self._trim()
+        return new_samples
+
+    def _decode(self, window):
+        try:
+            return decode_audio(self.header + bytes(window))
+        except Exception:
+            return None
+
+    def _trim(self):
+        """Drops the clusters before the last one; their samples have all been handed out."""
+        cut = self.window.rfind(_WEBM_CLUSTER)
+        if cut <= 0:
+            return
+        tail = self.window[cut:]
+        samples = self._decode(tail)
+        if samples is None:
+            return
+        self.window = bytearray(tail)
+        # Samples of the (possibly still growing) last cluster were already emitted
+        self.samples_emitted = len(samples)
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcriber for one websocket session.
+    feed() returns a list of events: {"type": "partial", "text": ...} while the
+    user talks and {"type": "final", "text": ...} once they stop.
+    """
+
+    def __init__(self, transcribe, partial_interval=0.5, end_silence=0.7, max_utterance=30.0, min_speech=0.25):
+        # transcribe(samples, partial) -> str, so the caller decides which model/options to use
+        self.transcribe = transcribe
+        self.partial_interval = int(partial_interval * SAMPLE_RATE)
+        self.end_silence = int(end_silence * SAMPLE_RATE)
+        self.max_utterance = int(max_utterance * SAMPLE_RATE)
+        self.min_speech = int(min_speech * SAMPLE_RATE)
+        # Silero VAD from faster-whisper, imported when the first stream opens rather than at startup
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        self.get_speech_timestamps = get_speech_timestamps
+        self.vad_options = VadOptions(min_silence_duration_ms=int(end_silence * 500), speech_pad_ms=100)
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.pending = 0          # Samples received since the last VAD/partial pass
+        self.last_partial = ""
+
+    def feed(self, samples):
+        """Adds samples to the rolling buffer and returns any new events."""
+        if len(samples) == 0:
+            return []
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.pending += len(samples)
+
+        # Don't run VAD/Whisper on every tiny chunk; wait for a useful amount of new audio
+        if self.pending < self.partial_interval and len(self.buffer) < self.max_utterance:
+            return []
+        self.pending = 0
+
+        speech = self.get_speech_timestamps(self.buffer, self.vad_options)
+        if not speech:
+            # Nothing but silence so far: keep a short tail so a word onset isn't cut off
+            self.buffer = self.buffer[-self.partial_interval:]
+            return []
+
+        start, end = speech[0]["start"], speech[-1]["end"]
+        trailing_silence = len(self.buffer) - end
+
+        # 1. End of utterance (or the buffer is full): produce the final transcript
+        if trailing_silence >= self.end_silence or len(self.buffer) >= self.max_utterance:
+            return self._finalize(start, end)
+
+        # 2. Still talking: re-transcribe the utterance so far as a partial result
+        if end - start < self.min_speech:
+            return []
+        text = self.transcribe(self.buffer[start:], partial=True)
+        if text and text != self.last_partial:
+            self.last_partial = text
+            return [{"type": "partial", "text": text}]
+        return []
+
+    def flush(self):
+        """Called when the client says it stopped recording: finalize whatever is left."""
+        if len(self.buffer) == 0:
+            return []
+        speech = self.get_speech_timestamps(self.buffer, self.vad_options)
+        if not speech:
+            self._reset(len(self.buffer))
+            return []
+        return self._finalize(speech[0]["start"], speech[-1]["end"])
+
+    def _finalize(self, start, end):
+        events = []
+        if end - start >= self.min_speech:
+            text = self.transcribe(self.buffer[start:end], partial=False)
+            if text:
+                events.append({"type": "final", "text": text})
+        self._reset(end)
+        return events
+
+    def _reset(self, consumed):
+        # Keep anything after the utterance; it may be the start of the next one
+        self.buffer = self.buffer[consumed:]
+        self.pending = len(self.buffer)
+        self.last_partial = ""
+
+
+class SentenceSplitter:
+    """
+    Cuts a stream of LLM tokens into sentences so each one can be spoken as soon as it
+    is complete. A sentence ends at . ! ? followed by whitespace (so "3.14" stays whole);
+    very short pieces ("Dr.", "Ok.") are merged into the next sentence.
+    """
+
+    _BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+")
+
+    def __init__(self, min_chars=12):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for boundary in self._BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:boundary.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = boundary.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
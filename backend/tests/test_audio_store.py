@@ -0,0 +1,45 @@
+import os
+import time
+from audio_store import AudioStore
+
+
+def test_put_then_path_and_invalid_names(tmp_path):
+    store = AudioStore(str(tmp_path))
+    name = AudioStore.key("Done.", "voice", 170)
+    assert store.lookup(name) is None
+    store.put(name, b"RIFF")
+    assert store.lookup(name) == os.path.join(str(tmp_path), name)
+    assert store.path("../etc/passwd") is None
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_files_written_by_another_process_are_found(tmp_path):
+    # Two stores on one directory stand in for two worker processes
+    writer, reader = AudioStore(str(tmp_path)), AudioStore(str(tmp_path))
+    name = AudioStore.key("Opened YouTube.", "voice", 170)
+    writer.put(name, b"RIFF")
+    assert reader.path(name) is not None
+
+
+def test_byte_budget_covers_the_whole_directory(tmp_path):
+    first, second = AudioStore(str(tmp_path), max_bytes=25), AudioStore(str(tmp_path), max_bytes=25)
+    names = [AudioStore.key(str(i), "voice", 170) for i in range(3)]
+    first.put(names[0], b"x" * 10)
+    second.put(names[1], b"x" * 10)
+    # Least recently used is names[0] unless it is used again
+    os.utime(os.path.join(str(tmp_path), names[0]), (time.time() - 60, time.time() - 60))
+    os.utime(os.path.join(str(tmp_path), names[1]), (time.time() - 30, time.time() - 30))
+    assert second.path(names[0])
+    first.put(names[2], b"x" * 10)
+    assert sorted(os.listdir(str(tmp_path))) == sorted([names[0], names[2]])
+    assert second.stats()["bytes"] == 20
+
+
+def test_expired_files_are_not_served(tmp_path):
+    store = AudioStore(str(tmp_path), max_age=60)
+    name = AudioStore.key("old", "voice", 170)
+    store.put(name, b"RIFF")
+    old = time.time() - 120
+    os.utime(os.path.join(str(tmp_path), name), (old, old))
+    assert store.path(name) is None
+    assert not os.listdir(str(tmp_path))
@@ -0,0 +1,83 @@
+import pytest
+from intent_matcher import IntentMatcher, KNOWN_SITES, normalize
+
+
+@pytest.fixture
+def matcher():
+    return IntentMatcher(["spotify", "notepad", "visual studio code"])
+
+
+def test_normalize_strips_filler_and_punctuation():
+    assert normalize("Hey Jarvis, open Spotify please!") == "open spotify"
+    assert normalize("  Could you   tell me the time?  ") == "tell me the time"
+
+
+@pytest.mark.parametrize("spoken, text", [
+    ("Type Hello, World!", "Hello, World!"),
+    ("type I'll be there now", "I'll be there now"),
+    ("Hey Jarvis, type out Meet me at 5.", "Meet me at 5."),
+    ("please type: Dear Sir", "Dear Sir"),
+])
+def test_type_text_keeps_the_original_wording(matcher, spoken, text):
+    result = matcher.match(spoken)
+    assert result["tool"] == "type_text"
+    assert result["args"] == {"text": text}
+
+
+@pytest.mark.parametrize("spoken, tool, args", [
+    ("Search Google for C++ tutorials, please.", "search_google", {"query": "C++ tutorials"}),
+    ("google Python's GIL", "search_google", {"query": "Python's GIL"}),
+    ("Jarvis, look up Alan Turing on Wikipedia.", "get_wikipedia", {"q": "Alan Turing"}),
+    ("Wikipedia for Ada Lovelace", "get_wikipedia", {"q": "Ada Lovelace"}),
+])
+def test_queries_keep_case_and_punctuation(matcher, spoken, tool, args):
+    result = matcher.match(spoken)
+    assert (result["tool"], result["args"]) == (tool, args)
+
+
+def test_rules_resolve_apps_and_sites(matcher):
+    assert matcher.match("Open Visual Studio Code please")["args"] == {"app_name": "visual studio code"}
+    assert matcher.match("go to YouTube")["args"] == {"url": KNOWN_SITES["youtube"]}
+    assert matcher.match("open example.com")["args"] == {"url": "https://example.com"}
+    assert matcher.match("shut down the computer")["tool"] == "shutdown_system"
+
+
+def test_classifier_matches_close_phrasings(matcher):
+    result = matcher.match("what's the time?")
+    assert result["tool"] == "get_time"
+    assert result["source"] == "classifier"
+    assert matcher.match("turn the volume up")["args"] == {"action": "up"}
+
+
+def test_conversation_falls_back_to_the_llm(matcher):
+    assert matcher.match("why is the sky blue during the day but red at sunset") is None
+    assert matcher.match("open the pod bay doors") is None
+
+
+@pytest.mark.parametrize("spoken", [
+    "Type of music do you like?",
+    "what type of music do you like",
+    "Google is a good company right?",
+    "google is a good company right",
+    "Don't lock the screen",
+    "please do not mute the sound",
+    "never tell me a joke",
+    "is the volume up",
+    "do you type fast?",
+])
+def test_mentions_of_a_command_are_not_commands(matcher, spoken):
+    assert matcher.match(spoken) is None
+
+
+def test_power_commands_need_an_exact_rule(matcher):
+    # Never resolved by fuzzy similarity
+    assert matcher.match("shut it all down") is None
+
+
+def test_stats_count_hits_and_fallbacks(matcher):
+    matcher.match("open spotify")
+    matcher.match("what time is it")
+    matcher.match("tell me about the roman empire and its fall")
+    stats = matcher.stats()
+    assert (stats["total"], stats["rule_hits"], stats["classifier_hits"], stats["fallback"]) == (3, 1, 1, 1)
+    assert stats["tool_hits"] == {"open_application": 1, "get_time": 1}
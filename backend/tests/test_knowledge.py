@@ -0,0 +1,105 @@
+import pytest
+import knowledge
+from knowledge import AMBIGUOUS, MISSING, OK, KnowledgeBase, normalize_query
+
+
+class CountingBackend:
+    """Scripted backend that records every query it is asked."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.queries = []
+        self.fail = False
+
+    def lookup(self, query):
+        self.queries.append(query)
+        if self.fail:
+            raise OSError("network down")
+        return self.entries.get(normalize_query(query), (MISSING, None))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(knowledge.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend({
+        "alan turing": (OK, "Alan Turing was an English mathematician."),
+        "mercury": (AMBIGUOUS, ["Mercury (planet)", "Mercury (element)"]),
+    })
+
+
+@pytest.fixture
+def kb(backend, tmp_path, clock):
+    return KnowledgeBase(backend, str(tmp_path / "knowledge.sqlite3"), ttl=100, negative_ttl=10)
+
+
+def test_hits_are_served_from_the_cache(kb, backend):
+    assert kb.lookup("Alan Turing!") == "Alan Turing was an English mathematician."
+    assert kb.lookup("alan   turing") == "Alan Turing was an English mathematician."
+    assert backend.queries == ["Alan Turing!"]
+    assert kb.stats()["hits"] == 1
+
+
+def test_entries_expire_after_the_ttl(kb, backend, clock):
+    kb.lookup("alan turing")
+    clock[0] += 99
+    kb.lookup("alan turing")
+    clock[0] += 2
+    kb.lookup("alan turing")
+    assert backend.queries == ["alan turing", "alan turing"]
+
+
+def test_missing_pages_are_cached_with_the_negative_ttl(kb, backend, clock):
+    assert kb.lookup("zzyzx").startswith("Could not")
+    assert kb.lookup("zzyzx").startswith("Could not")
+    assert backend.queries == ["zzyzx"]
+    assert kb.stats()["negative_hits"] == 1
+    clock[0] += 11
+    kb.lookup("zzyzx")
+    assert backend.queries == ["zzyzx", "zzyzx"]
+
+
+def test_ambiguous_options_round_trip_through_sqlite(kb, backend):
+    first = kb.lookup("Mercury")
+    assert first == "'Mercury' may refer to several things: Mercury (planet), Mercury (element)."
+    assert kb.lookup("Mercury") == first
+    assert backend.queries == ["Mercury"]
+    assert kb._cached("mercury", count=False) == (AMBIGUOUS, ["Mercury (planet)", "Mercury (element)"])
+
+
+def test_backend_errors_are_not_cached(kb, backend):
+    backend.fail = True
+    with pytest.raises(OSError):
+        kb.lookup("alan turing")
+    backend.fail = False
+    assert kb.lookup("alan turing").startswith("Alan Turing")
+    assert kb.stats()["backend_errors"] == 1
+
+
+def test_warm_fetches_only_uncached_topics(kb, backend):
+    kb.lookup("alan turing")
+    summary = kb.warm(["Alan Turing", "mercury", "zzyzx", "zzyzx", " "], workers=2)
+    assert summary == {OK: 0, MISSING: 1, AMBIGUOUS: 1, "errors": 0}
+    assert sorted(backend.queries) == ["alan turing", "mercury", "zzyzx"]
+
+
+def test_symbols_that_change_the_topic_are_kept(kb, backend):
+    assert normalize_query(" C++  ") == "c++"
+    assert normalize_query("AT&T!") == "at&t"
+    kb.lookup("C++")
+    kb.lookup("C#")
+    kb.lookup("AT&T")
+    assert backend.queries == ["C++", "C#", "AT&T"]
+    assert kb.stats()["entries"] == 3
+    assert kb.stats()["entries"] == 3
+
+
+def test_cache_is_shared_through_the_database_file(kb, backend, tmp_path):
+    kb.lookup("alan turing")
+    other = KnowledgeBase(CountingBackend({}), str(tmp_path / "knowledge.sqlite3"))
+    assert other.lookup("alan turing").startswith("Alan Turing")
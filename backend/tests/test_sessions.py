@@ -0,0 +1,76 @@
+import json
+import pytest
+import sessions
+from sessions import SessionStore, estimate_tokens
+
+
+def turn(user, reply, tool=None):
+    messages = [{"role": "user", "content": user}]
+    if tool:
+        messages.append({"role": "assistant", "content": None, "tool_calls": [
+            {"id": "c1", "type": "function", "function": {"name": tool, "arguments": json.dumps({"q": user})}}
+        ]})
+        messages.append({"role": "tool", "tool_call_id": "c1", "name": tool, "content": "result " * 200})
+    messages.append({"role": "assistant", "content": reply})
+    return messages
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.sqlite3")
+
+
+def test_no_session_means_no_history(db_path):
+    store = SessionStore(db_path)
+    store.record(None, turn("hi", "hello"))
+    assert store.history(None) == []
+    assert store.history("unknown") == []
+
+
+def test_turns_come_back_in_order(db_path):
+    store = SessionStore(db_path)
+    store.record("a", turn("open spotify", "Opened Spotify."))
+    store.record("a", turn("turn it up", "Volume up."))
+    history = store.history("a")
+    assert [m["content"] for m in history if m["role"] == "user"] == ["open spotify", "turn it up"]
+    assert store.history("b") == []
+
+
+def test_history_stays_within_the_token_budget(db_path):
+    store = SessionStore(db_path, token_budget=300, keep_turns=4)
+    for position in range(30):
+        store.record("a", turn(f"question {position} " * 10, f"answer {position} " * 20, tool="get_wikipedia"))
+        assert estimate_tokens(store.history("a")) <= 300
+    history = store.history("a")
+    assert history[0]["role"] == "system" and history[0]["content"].startswith("Earlier in this conversation:")
+    assert store.stats()["compactions"] > 0
+
+
+def test_sessions_are_shared_between_processes(db_path):
+    # Two stores on one file stand in for two serve.py worker processes
+    first, second = SessionStore(db_path), SessionStore(db_path)
+    first.record("a", turn("open spotify", "Opened Spotify."))
+    second.record("a", turn("turn it up", "Volume up."))
+    assert len(first.history("a")) == 4
+    assert first.stats()["sessions"] == second.stats()["sessions"] == 1
+
+
+def test_idle_sessions_expire(db_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    store = SessionStore(db_path, idle_ttl=60)
+    store.record("a", turn("hi", "hello"))
+    now[0] += 61
+    assert store.history("a") == []
+    assert store.stats()["sessions"] == 0
+
+
+def test_least_recently_used_sessions_are_dropped(db_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    store = SessionStore(db_path, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        now[0] += 1
+        store.record(session_id, turn("hi", "hello"))
+    assert store.history("a") == []
+    assert store.history("b") and store.history("c")
@@ -0,0 +1,80 @@
+import threading
+import time
+import pytest
+from tool_executor import ToolExecutor
+
+SERIAL = {"type_a", "type_b"}
+
+
+@pytest.fixture
+def release():
+    # Hanging calls wait on this; set at teardown so their pool threads can finish
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def run(executor, names, run_one, timeouts=None):
+    timeouts = timeouts or {}
+    return executor.run_all(
+        [{"name": name} for name in names],
+        run_one=run_one,
+        timeout_for=lambda call: timeouts.get(call["name"]),
+        is_concurrent=lambda call: call["name"] not in SERIAL,
+    )
+
+
+def test_results_come_back_in_call_order():
+    executor = ToolExecutor()
+    assert run(executor, ["a", "type_a", "b", "type_b"], lambda call: call["name"].upper()) == ["A", "TYPE_A", "B", "TYPE_B"]
+
+
+def test_a_hanging_concurrent_call_times_out_alone(release):
+    executor = ToolExecutor(default_timeout=5)
+
+    def run_one(call):
+        if call["name"] == "slow":
+            release.wait()
+        return f"{call['name']} done"
+
+    started = time.monotonic()
+    results = run(executor, ["slow", "fast"], run_one, timeouts={"slow": 0.2})
+    assert time.monotonic() - started < 2
+    assert results == ["Error: slow timed out after 0.2s.", "fast done"]
+
+
+def test_a_hung_serial_call_skips_the_calls_after_it(release):
+    executor = ToolExecutor(default_timeout=5)
+    ran = []
+
+    def run_one(call):
+        ran.append(call["name"])
+        if call["name"] == "type_a":
+            release.wait()
+        return f"{call['name']} done"
+
+    results = run(executor, ["type_a", "open", "type_b"], run_one, timeouts={"type_a": 0.2})
+    assert results == [
+        "Error: type_a timed out after 0.2s.",
+        "open done",
+        "Error: type_b was skipped because an earlier input action timed out.",
+    ]
+    release.set()
+    time.sleep(0.1)
+    assert "type_b" not in ran
+
+
+def test_the_batch_deadline_caps_every_call(release):
+    executor = ToolExecutor(default_timeout=5, deadline=0.3)
+
+    def run_one(call):
+        release.wait()
+
+    started = time.monotonic()
+    results = run(executor, ["a", "b", "type_a"], run_one)
+    assert time.monotonic() - started < 2
+    assert results == [
+        "Error: a timed out after 0.3s.",
+        "Error: b timed out after 0.3s.",
+        "Error: type_a timed out after 0.3s.",
+    ]
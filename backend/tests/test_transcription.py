@@ -0,0 +1,82 @@
+import threading
+from types import SimpleNamespace
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from audio import SAMPLE_RATE
+from transcription import MAX_CHUNK_SECONDS, ModelLoading, TranscriptionScheduler
+
+WORDS = {1: "alpha", 2: "bravo", 3: "charlie"}
+
+
+class CollectingPipeline:
+    """
+    Stands in for BatchedInferencePipeline. Like faster-whisper 1.2 (collect_chunks), it merges
+    consecutive clip_timestamps into windows of up to 30 seconds and returns one segment per
+    window. Each clip is a constant tone whose amplitude (in tenths) names the word it "says".
+    """
+
+    def transcribe(self, audio, batch_size, clip_timestamps, **options):
+        limit = int(MAX_CHUNK_SECONDS * SAMPLE_RATE)
+        windows = []
+        for stamp in clip_timestamps:
+            start, end = int(stamp["start"] * SAMPLE_RATE), int(stamp["end"] * SAMPLE_RATE)
+            if windows and windows[-1]["duration"] + (end - start) <= limit:
+                windows[-1]["chunks"].append(audio[start:end])
+                windows[-1]["duration"] += end - start
+            else:
+                windows.append({"start": stamp["start"], "chunks": [audio[start:end]], "duration": end - start})
+
+        segments = []
+        for window in windows:
+            words = []
+            for chunk in window["chunks"]:
+                for level in np.unique(np.round(chunk * 10).astype(int)):
+                    if level and WORDS[level] not in words:
+                        words.append(WORDS[level])
+            segments.append(SimpleNamespace(start=window["start"], text=" " + " ".join(words)))
+        return iter(segments), None
+
+
+def tone(word, seconds):
+    level = next(level for level, name in WORDS.items() if name == word)
+    return np.full(int(seconds * SAMPLE_RATE), level / 10, dtype=np.float32)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = TranscriptionScheduler(replicas=1, queue_size=4, job_timeout=5)
+    scheduler.batched = CollectingPipeline()
+    scheduler.ready.set()
+    threading.Thread(target=scheduler._worker, daemon=True).start()
+    return scheduler
+
+
+def test_short_clips_in_one_group_keep_their_own_text(scheduler):
+    texts = scheduler.submit_batch([tone("alpha", 2), tone("bravo", 3)]).result(timeout=5)
+    assert texts == ["alpha", "bravo"]
+
+
+def test_long_clip_is_split_into_windows_of_its_own(scheduler):
+    texts = scheduler.submit_batch([tone("alpha", 45), tone("bravo", 1), tone("charlie", 30)]).result(timeout=5)
+    assert texts == ["alpha alpha", "bravo", "charlie"]
+
+
+def test_transcribe_batch_yields_every_clip(scheduler):
+    clips = [tone("alpha", 1), tone("bravo", 1), tone("charlie", 1)]
+    results = sorted(scheduler.transcribe_batch(clips, batch_size=2))
+    assert results == [(0, "alpha", None), (1, "bravo", None), (2, "charlie", None)]
+
+
+def test_transcribe_batch_fails_when_the_model_failed_to_load():
+    scheduler = TranscriptionScheduler(replicas=1, job_timeout=5)
+    scheduler.load_error = OSError("model not found")
+    with pytest.raises(RuntimeError, match="model not found"):
+        list(scheduler.transcribe_batch([tone("alpha", 1)]))
+
+
+def test_transcribe_batch_stops_waiting_for_a_model_that_never_loads():
+    scheduler = TranscriptionScheduler(replicas=1, job_timeout=0.1)
+    with pytest.raises(ModelLoading):
+        list(scheduler.transcribe_batch([tone("alpha", 1)]))
@@ -0,0 +1,87 @@
+import contextvars                                          # Carry the request's trace into pool threads
+import time                                                 # Per-call and overall deadlines
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeout   # Bounded pool for tool calls
+
+#  CONCURRENT TOOL EXECUTOR
+# One completion can ask for several tool calls ("open spotify and turn the volume up").
+# They are independent, so they run at the same time on a bounded pool instead of one
+# after another on the request thread. Every call has a timeout; when it expires the
+# caller gets an error string for that call and keeps whatever the others returned.
+# Tools that drive the keyboard/mouse (concurrent=False) share one ordered lane so their
+# key presses never interleave.
+#
+# Note: Python threads can't be killed, so a timed-out call keeps its pool thread until it
+# returns on its own. The pool is bounded, which stops a hanging tool from taking the host down.
+
+
+class ToolExecutor:
+    def __init__(self, max_workers=8, default_timeout=10.0, deadline=15.0):
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jarvis-tool")
+        self.default_timeout = default_timeout
+        # Upper bound for the whole batch, however many calls it contains
+        self.deadline = deadline
+
+    def after_fork(self):
+        """Replaces the pool in a forked worker process; the parent's threads don't exist there."""
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="jarvis-tool")
+
+    def run_all(self, calls, run_one, timeout_for, is_concurrent):
+        """
+        Runs every call and returns their results in the original order.
+        run_one(call) executes a call; timeout_for(call) gives its timeout (or None for the default);
+        is_concurrent(call) says whether it may run in parallel with the others.
+        """
+        started = time.monotonic()
+        batch_deadline = started + self.deadline
+        futures = [None] * len(calls)
+        timeouts = [timeout_for(call) or self.default_timeout for call in calls]
+        deadlines = [None] * len(calls)
+
+        # 1. Independent calls: one pool task each
+        serial = []
+        for position, call in enumerate(calls):
+            if is_concurrent(call):
+                futures[position] = self.pool.submit(contextvars.copy_context().run, run_one, call)
+                deadlines[position] = started + timeouts[position]
+            else:
+                serial.append(position)
+
+        # 2. Keyboard/mouse calls: one task runs them in order, with a future per call so each
+        # result is known as soon as that call finishes. A call waits for the ones before it,
+        # so its deadline is the sum of their timeouts and its own.
+        if serial:
+            lane_deadline = started
+            for position in serial:
+                futures[position] = Future()
+                lane_deadline += timeouts[position]
+                deadlines[position] = lane_deadline
+
+            def run_lane():
+                for position in serial:
+                    future = futures[position]
+                    if not future.set_running_or_notify_cancel():
+                        continue  # Skipped because an earlier call timed out
+                    try:
+                        future.set_result(run_one(calls[position]))
+                    except Exception as e:
+                        future.set_exception(e)
+
+            self.pool.submit(contextvars.copy_context().run, run_lane)
+
+        # 3. Collect: each call gets its own timeout, but nobody waits past the batch deadline
+        results = [None] * len(calls)
+        for position, call in enumerate(calls):
+            remaining = min(deadlines[position], batch_deadline) - time.monotonic()
+            try:
+                results[position] = futures[position].result(timeout=max(0.0, remaining))
+            except FutureTimeout:
+                futures[position].cancel()
+                results[position] = f"Error: {call['name']} timed out after {min(timeouts[position], self.deadline):g}s."
+                if position in serial:
+                    # Don't start the remaining keyboard/mouse calls after one that hung
+                    for later in serial[serial.index(position) + 1:]:
+                        futures[later].cancel()
+            except CancelledError:
+                results[position] = f"Error: {call['name']} was skipped because an earlier input action timed out."
+        return results
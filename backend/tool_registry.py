@@ -0,0 +1,165 @@
+import inspect                                              # Introspection, used once per tool at import time
+from types import MappingProxyType                          # Read-only views of the frozen registry
+
+#  DECLARATIVE TOOL REGISTRY
+# Every tool is declared exactly once, next to its Python function:
+#
+#     @TOOLS.tool(description="Searches Google for a term.",
+#                 parameters={"query": {"type": "string", "description": "The search term"}})
+#     def search_google(query): ...
+#
+# From that single declaration we generate the LLM function-calling schema, the
+# argument validator and the parameter filter. Declared parameters are checked
+# against the function signature when the module is imported, so the schema
+# and the code can't drift apart. Once frozen, a tool call at request time is a
+# dict lookup plus a few set operations; nothing is rebuilt or introspected.
+#
+# A tool can also declare how to confirm itself to the user (confirm=...), either
+# as a format string over its arguments and {result}, or as a function taking
+# (args, result). Those tools don't need a second LLM completion just to turn
+# "Volume up." into a sentence. Tools without one (or marked summarize=True)
+# still go back to the LLM.
+#
+# cacheable=True marks tools whose *selection* may be served from the intent
+# cache (the tool itself is still executed on every hit). Anything with live
+# results (time, jokes) or side effects must stay uncacheable, which is the default.
+#
+# timeout= caps how long the executor waits for a call, and concurrent=False keeps
+# keyboard/mouse tools in one ordered lane instead of running them in parallel.
+
+
+class ToolSpec:
+    """A single registered tool with its pre-generated schema and validation data."""
+
+    def __init__(self, name, function, description, parameters, required, confirm=None, summarize=False, cacheable=False,
+                 timeout=None, concurrent=True):
+        self.name = name
+        self.function = function
+        self.description = description
+        self.parameters = parameters
+        self.required = frozenset(required)
+        self.accepted = frozenset(parameters)
+        self.confirm = confirm
+        self.summarize = summarize
+        self.cacheable = cacheable
+        self.timeout = timeout
+        self.concurrent = concurrent
+        self.use_template = confirm is not None and not summarize
+
+        # JSON schema in the exact shape the OpenAI/Groq tools API expects
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": description,
+                "parameters": {
+                    "type": "object",
+                    "properties": parameters,
+                    "required": [key for key in parameters if key in self.required],
+                },
+            },
+        }
+
+    def validate(self, args):
+        """
+        Drops arguments the tool doesn't declare and checks the ones it does.
+        Returns the filtered arguments, or raises ValueError with a message the LLM can act on.
+        """
+        filtered = {key: value for key, value in args.items() if key in self.accepted}
+
+        missing = self.required - filtered.keys()
+        if missing:
+            raise ValueError(f"Missing required argument(s) for {self.name}: {', '.join(sorted(missing))}")
+
+        for key, value in filtered.items():
+            spec = self.parameters[key]
+            if spec.get("type") == "string" and not isinstance(value, str):
+                raise ValueError(f"Argument '{key}' for {self.name} must be a string.")
+            if "enum" in spec and value not in spec["enum"]:
+                raise ValueError(f"Argument '{key}' for {self.name} must be one of {spec['enum']}.")
+        return filtered
+
+    def confirmation(self, args, result):
+        """Local confirmation sentence for a successful call, or None if the LLM should word it."""
+        if not self.use_template:
+            return None
+        if callable(self.confirm):
+            return self.confirm(args, result)
+        return self.confirm.format(**{**args, "result": result})
+
+
+class ToolRegistry:
+    def __init__(self):
+        self.specs = {}
+        self.frozen = False
+        self.definitions = []
+        self.functions = MappingProxyType({})
+
+    def tool(self, name=None, description="", parameters=None, required=None, confirm=None, summarize=False, cacheable=False,
+             timeout=None, concurrent=True):
+        """Decorator form of register(); returns the function unchanged."""
+        def decorator(function):
+            self.register(function, name=name, description=description, parameters=parameters, required=required,
+                          confirm=confirm, summarize=summarize, cacheable=cacheable, timeout=timeout, concurrent=concurrent)
+            return function
+        return decorator
+
+    def register(self, function, name=None, description="", parameters=None, required=None, confirm=None, summarize=False,
+                 cacheable=False, timeout=None, concurrent=True):
+        """
+        Registers a function as a tool. parameters maps argument names to JSON schema
+        properties; by default every declared parameter is required. confirm is the local
+        confirmation (format string or callable); summarize=True always asks the LLM instead.
+        cacheable=True allows the intent cache to reuse the AI's decision to call this tool.
+        timeout is in seconds (None uses the executor default); concurrent=False serializes the tool.
+        """
+        if self.frozen:
+            raise RuntimeError("Tool registry is frozen; register tools at import time.")
+
+        name = name or function.__name__
+        parameters = parameters or {}
+        required = list(parameters) if required is None else required
+
+        if name in self.specs:
+            raise ValueError(f"Tool '{name}' is registered twice.")
+        if set(required) - set(parameters):
+            raise ValueError(f"Tool '{name}' requires undeclared parameters: {set(required) - set(parameters)}")
+
+        # Cross-check the declaration against the real signature, once, at import time
+        signature = inspect.signature(function)
+        takes_kwargs = any(p.kind == p.VAR_KEYWORD for p in signature.parameters.values())
+        if not takes_kwargs:
+            unknown = set(parameters) - set(signature.parameters)
+            if unknown:
+                raise TypeError(f"Tool '{name}' declares parameters its function does not accept: {unknown}")
+        undeclared = {
+            key for key, p in signature.parameters.items()
+            if p.default is p.empty and p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) and key not in parameters
+        }
+        if undeclared:
+            raise TypeError(f"Tool '{name}' has function parameters missing from its schema: {undeclared}")
+
+        self.specs[name] = ToolSpec(name, function, description, parameters, required, confirm, summarize, cacheable,
+                                   timeout, concurrent)
+        return self.specs[name]
+
+    def freeze(self, llm_confirm=()):
+        """
+        Generates the LLM tool list once; the registry is read-only afterwards.
+        llm_confirm names tools whose confirmation should always be worded by the LLM ("*" for all).
+        """
+        unknown = set(llm_confirm) - set(self.specs) - {"*"}
+        if unknown:
+            raise ValueError(f"Unknown tools in LLM confirmation list: {unknown}")
+        for name, spec in self.specs.items():
+            if "*" in llm_confirm or name in llm_confirm:
+                spec.use_template = False
+
+        self.frozen = True
+        self.definitions = [spec.schema for spec in self.specs.values()]
+        self.functions = MappingProxyType({name: spec.function for name, spec in self.specs.items()})
+        self.specs = MappingProxyType(self.specs)
+        return self
+
+    def get(self, name):
+        return self.specs.get(name)
@@ -0,0 +1,591 @@
+import os                                                   # CPU count and environment-based configuration
+import queue                                                # Bounded job queue shared by the worker threads
+import threading                                            # Worker threads that own the model replicas
+import time                                                 # Deadlines and job duration tracking
+from collections import deque                               # Window of in-flight batch jobs
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout   # Result handles for request threads
+from multiprocessing.connection import Client, Listener     # Model server for forked web workers (see serve.py)
+import numpy as np                                          # Packing several clips into one padded sample array
+from audio import SAMPLE_RATE                               # Sample rate of the decoded clips (16 kHz)
+
+#  TRANSCRIPTION SCHEDULER
+# Instead of every Flask thread calling one shared model with all cores each,
+# requests are put on a bounded queue and served by N workers. The model is
+# loaded once with num_workers=N, which gives CTranslate2 N independent replicas
+# that share the same weights, each running with its own small cpu_threads budget.
+# When the queue is full we refuse new work immediately (the route turns that
+# into 503 + Retry-After) instead of letting latency grow without limit.
+#
+# Loading is separate from construction: start() imports faster-whisper, loads the
+# weights and runs one dummy transcription so CTranslate2 allocates its buffers
+# before the first real request. start_background() does that on a thread, so the
+# web server can accept connections (and answer health checks) in the meantime.
+#
+# CTranslate2 runs its replicas on native threads, which don't survive fork(). So when
+# several web worker processes are forked (serve.py), one separate process owns the
+# model and runs SchedulerServer; the workers talk to it through RemoteScheduler, which
+# has the same interface as TranscriptionScheduler. One copy of the weights, however
+# many web workers there are.
+
+
+class QueueFullError(Exception):
+    """Raised when the transcription queue cannot take another job."""
+
+    def __init__(self, retry_after):
+        super().__init__("Transcription queue is full.")
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        # Sent back to RemoteScheduler by pickling; rebuild from retry_after, not from the message
+        return type(self), (self.retry_after,)
+
+
+class ModelLoading(QueueFullError):
+    """Raised while the model is still loading; handled like a full queue (503 + Retry-After)."""
+
+    def __init__(self, retry_after=5):
+        super().__init__(retry_after)
+        self.args = ("Speech model is still loading.",)
+
+
+class TranscriptionTimeout(Exception):
+    """Raised when a job did not finish (or start) before its deadline."""
+
+
+# Whisper works on 30 second windows; longer clips are split into pieces of this size
+MAX_CHUNK_SECONDS = 30.0
+
+#  TRANSCRIPTION PROFILES
+# Voice commands are a few words long, so the default decode (beam search, language
+# detection, timestamps) is mostly wasted work. Two profiles:
+#   fast:     greedy decoding, language pinned, no timestamps, and the caller's vocabulary
+#             (app names, sites...) as initial_prompt so short commands come out spelled right
+#   accurate: beam search and language detection, optionally on a larger model
+#             (WHISPER_ACCURATE_MODEL=small); WHISPER_ACCURATE_LANGUAGE pins a language
+# With WHISPER_PROFILE=auto (default) each clip gets "fast" when it is short or when no
+# replica is idle, and "accurate" otherwise, so latency degrades gracefully under load.
+FAST, ACCURATE = "fast", "accurate"
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def profiles_from_env(model_size):
+    """Profile definitions: which model to use, transcribe() options, and whether to pass the vocabulary."""
+    def language(name, default):
+        value = os.getenv(name, default)
+        return None if value == "auto" else value
+
+    return {
+        FAST: {
+            "model": os.getenv("WHISPER_FAST_MODEL", model_size),
+            "options": {"beam_size": 1, "language": language("WHISPER_LANGUAGE", "en"), "without_timestamps": True,
+                        "condition_on_previous_text": False},
+            "vocabulary": True,
+        },
+        ACCURATE: {
+            "model": os.getenv("WHISPER_ACCURATE_MODEL", model_size),
+            # Not pinned by default: this is the profile that can still get non-English speech right
+            "options": {"beam_size": 5, "language": language("WHISPER_ACCURATE_LANGUAGE", "auto")},
+            "vocabulary": False,
+        },
+    }
+
+
+class TranscriptionScheduler:
+    def __init__(self, model_size="base", replicas=None, cpu_threads=None, queue_size=None, job_timeout=None):
+        cores = os.cpu_count() or 1
+        self.model_size = model_size
+
+        # Defaults: one replica per 4 cores, and split the cores evenly so replicas don't oversubscribe
+        self.replicas = replicas or _env_int("WHISPER_REPLICAS", max(1, cores // 4))
+        self.cpu_threads = cpu_threads or _env_int("WHISPER_CPU_THREADS", max(1, cores // self.replicas))
+        self.queue_size = queue_size or _env_int("WHISPER_QUEUE_SIZE", self.replicas * 4)
+        self.job_timeout = job_timeout or float(os.getenv("WHISPER_JOB_TIMEOUT", "30"))
+        self.batch_size = _env_int("WHISPER_BATCH_SIZE", 8)
+
+        self.profiles = profiles_from_env(model_size)
+        self.profile = os.getenv("WHISPER_PROFILE", "auto")
+        # In auto mode, clips up to this long always use the fast profile
+        self.fast_max_seconds = float(os.getenv("WHISPER_FAST_MAX_SECONDS", "6"))
+        self.profile_counts = {name: 0 for name in self.profiles}
+
+        self.models = {}          # model size -> WhisperModel, one per size the profiles use
+        self.model = None         # The fast profile's model (also used for batches)
+        self.batched = None
+        self.ready = threading.Event()
+        self.load_error = None
+        self.load_seconds = None
+        self.start_lock = threading.Lock()
+
+        self.jobs = queue.Queue(maxsize=self.queue_size)
+        self.busy = 0
+        self.avg_job_seconds = 1.0   # Moving average, used to estimate Retry-After
+        # Totals for throughput: seconds of audio transcribed vs seconds workers spent on it
+        self.audio_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Loads and warms up the model, then starts the workers. Safe to call more than once."""
+        with self.start_lock:
+            if self.ready.is_set():
+                return
+            started = time.monotonic()
+            try:
+                # Imported here so that importing the app doesn't pay for CTranslate2
+                from faster_whisper import WhisperModel, BatchedInferencePipeline
+
+                warmup = (np.random.default_rng(0).standard_normal(SAMPLE_RATE) * 0.01).astype(np.float32)
+                for profile in self.profiles.values():
+                    if profile["model"] in self.models:
+                        continue
+                    model = self.models[profile["model"]] = WhisperModel(
+                        profile["model"],
+                        device="cpu",
+                        compute_type="int8",
+                        cpu_threads=self.cpu_threads,
+                        num_workers=self.replicas,
+                    )
+                    # Warm-up: one short dummy clip through the full decode path
+                    segments, info = model.transcribe(warmup, **profile["options"])
+                    list(segments)
+                self.model = self.models[self.profiles[FAST]["model"]]
+                self.batched = BatchedInferencePipeline(model=self.model)
+            except Exception as e:
+                self.load_error = e
+                print(f"[LOG] Faster-Whisper failed to load: {e}")
+                raise
+
+            for i in range(self.replicas):
+                threading.Thread(target=self._worker, name=f"whisper-worker-{i}", daemon=True).start()
+            self.load_seconds = time.monotonic() - started
+            self.ready.set()
+
+    def start_background(self, on_ready=None):
+        """Runs start() on a thread; on_ready() is called once the model is warm."""
+        def run():
+            try:
+                self.start()
+            except Exception:
+                return
+            if on_ready:
+                on_ready()
+        threading.Thread(target=run, name="whisper-loader", daemon=True).start()
+
+    def after_fork(self):
+        raise RuntimeError("CTranslate2 threads don't survive fork(); serve the model with SchedulerServer "
+                           "and use RemoteScheduler in forked processes.")
+
+    def choose_profile(self, audio_seconds):
+        if self.profile != "auto":
+            return self.profile
+        if audio_seconds <= self.fast_max_seconds:
+            return FAST
+        # Long clip: beam search only while a replica is free, otherwise don't make the queue wait on it
+        with self.lock:
+            backlog = self.jobs.qsize() + self.busy
+        return ACCURATE if backlog < self.replicas else FAST
+
+    def submit(self, samples, timeout=None, profile=None, vocabulary=None, **options):
+        """
+        Queues a transcription job and returns a Future that resolves to the transcript text.
+        profile is "fast", "accurate" or None to choose by clip length and load; vocabulary is a
+        short list of expected words, used as initial_prompt by profiles that want it.
+        Explicit options override the profile's.
+        """
+        profile = profile or self.choose_profile(len(samples) / SAMPLE_RATE)
+        settings = self.profiles[profile]
+        model = self.models.get(settings["model"])
+        options = {**settings["options"], **options}
+        if settings["vocabulary"] and vocabulary:
+            options.setdefault("initial_prompt", vocabulary)
+
+        def job():
+            with self.lock:
+                self.profile_counts[profile] += 1
+            segments, info = model.transcribe(samples, **options)
+            # Segments are a lazy generator; consume it here so decoding happens on the worker
+            return " ".join(segment.text for segment in segments).strip()
+
+        return self._enqueue(job, timeout, audio_seconds=len(samples) / SAMPLE_RATE)
+
+    def submit_batch(self, clips, batch_size=None, timeout=None):
+        """
+        Queues one batched run over several clips; the Future resolves to a list of transcripts.
+        Each clip (or 30 second piece of it) is zero-padded to a full 30 second window and
+        passed to BatchedInferencePipeline as its own clip_timestamp, so the pipeline decodes
+        up to batch_size of them in one forward pass.
+        """
+        batch_size = batch_size or self.batch_size
+
+        def job():
+            # BatchedInferencePipeline joins consecutive clip_timestamps into windows of up to
+            # 30 seconds and returns one segment per window (without_timestamps). So every clip
+            # (or 30 second piece of one) is zero-padded to a full window of its own: nothing can
+            # be merged with it, and each window is one row of the batched forward pass.
+            window = int(MAX_CHUNK_SECONDS * SAMPLE_RATE)
+            pieces, owners = [], []
+            for index, clip in enumerate(clips):
+                for start in range(0, len(clip), window):
+                    piece = np.zeros(window, dtype=np.float32)
+                    chunk = clip[start:start + window]
+                    piece[:len(chunk)] = chunk
+                    pieces.append(piece)
+                    owners.append(index)
+            if not pieces:
+                return ["" for _ in clips]
+
+            clip_timestamps = [
+                {"start": position * MAX_CHUNK_SECONDS, "end": (position + 1) * MAX_CHUNK_SECONDS}
+                for position in range(len(pieces))
+            ]
+            segments, info = self.batched.transcribe(
+                np.concatenate(pieces),
+                batch_size=batch_size,
+                clip_timestamps=clip_timestamps,
+                vad_filter=False,
+                without_timestamps=True,
+                language=self.profiles[FAST]["options"]["language"],
+            )
+            # Map every segment back to the clip whose window contains its start time
+            texts = [[] for _ in clips]
+            for segment in segments:
+                position = min(len(pieces) - 1, max(0, int((segment.start + 0.01) // MAX_CHUNK_SECONDS)))
+                texts[owners[position]].append(segment.text.strip())
+            return [" ".join(parts).strip() for parts in texts]
+
+        # A batch can legitimately take a while; scale the deadline with its size
+        return self._enqueue(
+            job,
+            timeout or self.job_timeout * max(1, len(clips) // batch_size + 1),
+            audio_seconds=sum(len(clip) for clip in clips) / SAMPLE_RATE,
+        )
+
+    def transcribe_batch(self, clips, batch_size=None, in_flight=None):
+        """
+        Python API for bulk transcription. Yields (index, text, error) for every clip, one
+        group of batch_size clips at a time, as soon as that group is done. A group that fails
+        (expired in the queue, model error) yields error messages for its clips and the
+        remaining groups carry on.
+        Only half the replicas are used by default so interactive /voice calls keep capacity.
+        """
+        batch_size = batch_size or self.batch_size
+        in_flight = in_flight or max(1, self.replicas // 2)
+        pending = deque()
+        # A bulk caller may start while the model is loading; it waits for it, but not forever
+        self._wait_until_ready(self.job_timeout)
+
+        def drain_one():
+            first_index, count, future = pending.popleft()
+            try:
+                texts = future.result()
+            except Exception as e:
+                print(f"[LOG] Batch of clips {first_index}-{first_index + count - 1} failed: {e}")
+                for offset in range(count):
+                    yield first_index + offset, None, str(e) or type(e).__name__
+                return
+            for offset, text in enumerate(texts):
+                yield first_index + offset, text, None
+
+        for first_index in range(0, len(clips), batch_size):
+            group = clips[first_index:first_index + batch_size]
+            while True:
+                if len(pending) >= in_flight:
+                    yield from drain_one()
+                try:
+                    pending.append((first_index, len(group), self.submit_batch(group, batch_size=batch_size)))
+                    break
+                except ModelLoading:
+                    # ModelLoading is a QueueFullError too, but waiting for room won't fix it
+                    self._wait_until_ready(self.job_timeout)
+                except QueueFullError as e:
+                    # Batch work waits for room instead of failing
+                    if pending:
+                        yield from drain_one()
+                    else:
+                        time.sleep(e.retry_after)
+
+        while pending:
+            yield from drain_one()
+
+    def _wait_until_ready(self, timeout):
+        """Blocks until the model is loaded. Raises if loading failed, or ModelLoading after timeout."""
+        deadline = time.monotonic() + timeout
+        while not self.ready.is_set():
+            if self.load_error:
+                raise RuntimeError(f"Speech model failed to load: {self.load_error}")
+            if time.monotonic() >= deadline:
+                raise ModelLoading()
+            self.ready.wait(0.5)
+
+    def _enqueue(self, job, timeout=None, audio_seconds=0.0):
+        if not self.ready.is_set():
+            raise ModelLoading()
+        future = Future()
+        deadline = time.monotonic() + (timeout or self.job_timeout)
+        try:
+            self.jobs.put_nowait((future, job, deadline, audio_seconds))
+        except queue.Full:
+            raise QueueFullError(self.retry_after())
+        return future
+
+    def transcribe(self, samples, timeout=None, **options):
+        """Blocking helper for request threads: submit, then wait up to the job timeout."""
+        timeout = timeout or self.job_timeout
+        future = self.submit(samples, timeout=timeout, **options)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # If the job hasn't started yet this removes it; a running job is simply abandoned
+            future.cancel()
+            raise TranscriptionTimeout(f"Transcription did not finish within {timeout:.0f}s.")
+
+    def retry_after(self):
+        """Rough number of seconds until the queue drains enough to accept new work."""
+        backlog = self.jobs.qsize() + self.busy
+        return max(1, int(backlog * self.avg_job_seconds / self.replicas + 0.5))
+
+    def stats(self):
+        return {
+            "ready": self.ready.is_set(),
+            "load_error": str(self.load_error) if self.load_error else None,
+            "replicas": self.replicas,
+            "cpu_threads": self.cpu_threads,
+            "job_timeout": self.job_timeout,
+            "queue_depth": self.jobs.qsize(),
+            "queue_size": self.queue_size,
+            "busy": self.busy,
+            "avg_job_seconds": round(self.avg_job_seconds, 3),
+            "audio_seconds_total": round(self.audio_seconds, 3),
+            "busy_seconds_total": round(self.busy_seconds, 3),
+            "profile": self.profile,
+            "profiles": {name: {"model": settings["model"], "jobs": self.profile_counts[name]}
+                         for name, settings in self.profiles.items()},
+        }
+
+    def _worker(self):
+        while True:
+            future, job, deadline, audio_seconds = self.jobs.get()
+
+            # Skip jobs whose caller already gave up (cancelled) or whose deadline passed in the queue
+            if not future.set_running_or_notify_cancel():
+                continue
+            if time.monotonic() > deadline:
+                future.set_exception(TranscriptionTimeout("Job expired while waiting in the queue."))
+                continue
+
+            with self.lock:
+                self.busy += 1
+            started = time.monotonic()
+            try:
+                future.set_result(job())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                elapsed = time.monotonic() - started
+                with self.lock:
+                    self.busy -= 1
+                    self.avg_job_seconds = 0.8 * self.avg_job_seconds + 0.2 * elapsed
+                    self.audio_seconds += audio_seconds
+                    self.busy_seconds += elapsed
+
+
+class SchedulerServer:
+    """Serves a TranscriptionScheduler over a Unix socket, one thread per client connection."""
+
+    def __init__(self, scheduler, address):
+        self.scheduler = scheduler
+        self.address = address
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, family="AF_UNIX") as listener:
+            while True:
+                connection = listener.accept()
+                threading.Thread(target=self._handle, args=(connection,), name="whisper-client", daemon=True).start()
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method == "stats":
+                        result = self.scheduler.stats()
+                    elif method == "transcribe":
+                        result = self.scheduler.transcribe(*args, **kwargs)
+                    elif method == "transcribe_batch":
+                        # Each clip is sent as soon as its group is done; the final "ok" ends the stream
+                        for item in self.scheduler.transcribe_batch(*args, **kwargs):
+                            connection.send(("item", item))
+                        result = None
+                    else:
+                        raise ValueError(f"Unknown method: {method}")
+                    connection.send(("ok", result))
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # Client went away in the middle of a streamed reply
+                except (QueueFullError, TranscriptionTimeout) as e:
+                    connection.send(("error", e))
+                except Exception as e:
+                    # Arbitrary exceptions may not pickle; the message is what the client needs
+                    connection.send(("error", RuntimeError(str(e))))
+
+
+class RemoteScheduler:
+    """
+    Client for SchedulerServer with the same interface as TranscriptionScheduler.
+    If the server stops answering (it crashed; serve.py restarts it), the client reports
+    not ready and answers ModelLoading until the server is back, instead of failing every call.
+    """
+
+    def __init__(self, address, poll_interval=0.5):
+        self.address = address
+        self.poll_interval = poll_interval
+        self.replicas = None
+        self.cpu_threads = None
+        self.job_timeout = float(os.getenv("WHISPER_JOB_TIMEOUT", "30"))
+        self.load_error = None
+        self.ready = threading.Event()
+        self.after_fork()
+
+    def after_fork(self):
+        """Drops connections and threads inherited from the parent process."""
+        self.local = threading.local()
+        self.lost_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=_env_int("WHISPER_CLIENT_THREADS", 16), thread_name_prefix="whisper-client")
+        if not self.ready.is_set() and getattr(self, "on_ready", None):
+            self.start_background(self.on_ready)
+
+    def start(self):
+        """Waits until the model server reports that the model is loaded."""
+        while not self.ready.is_set():
+            try:
+                self.stats()
+            except (EOFError, OSError):
+                pass  # Server process not listening (yet, or again)
+            if self.load_error:
+                raise RuntimeError(f"Speech model server failed to load the model: {self.load_error}")
+            if not self.ready.is_set():
+                time.sleep(self.poll_interval)
+
+    def start_background(self, on_ready=None):
+        self.on_ready = on_ready
+
+        def run():
+            try:
+                self.start()
+            except Exception as e:
+                print(f"[LOG] {e}")
+                return
+            if on_ready:
+                on_ready()
+        threading.Thread(target=run, name="whisper-ready-poll", daemon=True).start()
+
+    def submit(self, samples, timeout=None, **options):
+        if not self.ready.is_set():
+            raise ModelLoading()
+        return self.pool.submit(self.transcribe, samples, timeout, **options)
+
+    def transcribe(self, samples, timeout=None, **options):
+        if not self.ready.is_set():
+            raise ModelLoading()
+        try:
+            return self._call("transcribe", samples, timeout, **options)
+        except (EOFError, OSError):
+            raise ModelLoading()
+
+    def transcribe_batch(self, clips, batch_size=None, in_flight=None):
+        # The server streams one ("item", result) message per clip as its group finishes
+        yield from self._call_streaming("transcribe_batch", clips, batch_size, in_flight)
+
+    def stats(self):
+        stats = self._call("stats")
+        self.replicas, self.cpu_threads = stats["replicas"], stats["cpu_threads"]
+        self.job_timeout, self.load_error = stats["job_timeout"], stats["load_error"]
+        if stats["ready"]:
+            self.ready.set()
+        return {**stats, "server": self.address}
+
+    def _call(self, method, *args, **kwargs):
+        # One connection per thread, kept open between calls. A kept connection can be stale
+        # (the server was restarted since), so a failure on one is retried once on a new one.
+        for attempt in range(2):
+            connection = getattr(self.local, "connection", None)
+            fresh = connection is None
+            try:
+                if fresh:
+                    connection = self.local.connection = Client(self.address, family="AF_UNIX")
+                connection.send((method, args, kwargs))
+                status, value = connection.recv()
+                break
+            except (EOFError, OSError):
+                self._drop_connection()
+                if fresh or attempt:
+                    self._server_lost()
+                    raise
+        if status == "error":
+            raise value
+        return value
+
+    def _call_streaming(self, method, *args, **kwargs):
+        """Like _call, for methods that answer with several ("item", value) messages before "ok"."""
+        connection = getattr(self.local, "connection", None)
+        finished = False
+        try:
+            if connection is None:
+                connection = self.local.connection = Client(self.address, family="AF_UNIX")
+            connection.send((method, args, kwargs))
+            while True:
+                status, value = connection.recv()
+                if status == "item":
+                    yield value
+                    continue
+                finished = True
+                if status == "error":
+                    raise value
+                return
+        except (EOFError, OSError):
+            self._server_lost()
+            raise
+        finally:
+            if not finished:
+                # Abandoned or broken mid-stream: unread messages would confuse the next call
+                self._drop_connection()
+
+    def _drop_connection(self):
+        connection, self.local.connection = getattr(self.local, "connection", None), None
+        if connection is not None:
+            connection.close()
+
+    def _server_lost(self):
+        """Marks the server as not ready and polls in the background until it answers again."""
+        with self.lost_lock:
+            if not self.ready.is_set():
+                return  # Already waiting for it (or still loading)
+            self.ready.clear()
+        print(f"[LOG] Lost the speech model server at {self.address}; reporting not ready until it is back.")
+
+        def wait():
+            try:
+                self.start()
+            except Exception as e:
+                print(f"[LOG] {e}")
+                return
+            print("[LOG] Speech model server is back.")
+        threading.Thread(target=wait, name="whisper-reconnect", daemon=True).start()
+
+
+def serve_model(address, model_size="base"):
+    """Entry point of the model server process: load in the background, accept clients right away."""
+    scheduler = TranscriptionScheduler(model_size)
+    print(f"[LOG] Speech model server listening on {address}")
+    scheduler.start_background(on_ready=lambda: print(
+        f"[LOG] Faster-Whisper ready in the model server ({scheduler.replicas} replicas x {scheduler.cpu_threads} threads)."
+    ))
+    SchedulerServer(scheduler, address).serve_forever()
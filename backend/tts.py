@@ -0,0 +1,104 @@
+import os                                                   # Scratch file location
+import queue                                                # Jobs for the engine thread
+import tempfile                                             # Fallback scratch directory
+import threading                                            # The engine lives on one dedicated thread
+import uuid                                                 # Unique scratch file name per worker
+from concurrent.futures import Future                       # Result handle for callers
+
+#  PERSISTENT TTS WORKER
+# pyttsx3.init() and the voice scan are slow, and the engine is not thread safe.
+# So one thread owns one engine for the lifetime of the process: the voice is
+# resolved once when the engine starts and every reply is a job on its queue.
+# pyttsx3 can only render to a file, so the worker reuses a single scratch file
+# (in RAM-backed /dev/shm when available), reads it back and returns the bytes.
+# The engine is started by start() or on first use, never at import: under serve.py the
+# gunicorn master imports app.py, and pyttsx3.init() caches engines in a module-level
+# dict that forked workers would inherit, driver state included.
+
+
+class TTSWorker:
+    def __init__(self, preferred_voices=("david", "zira", "google"), rate=None):
+        self.preferred_voices = preferred_voices
+        self.rate = rate
+        self.voice_id = None
+        self.jobs = queue.Queue()
+        self.ready = threading.Event()
+        self.error = None
+        self.pid = None           # Process that owns the running engine thread
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        """Starts the engine thread in this process, if it isn't running here yet."""
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.voice_id = None
+            self.jobs = queue.Queue()
+            self.ready = threading.Event()
+            self.error = None
+
+            scratch_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            self.scratch_path = os.path.join(scratch_dir, f"jarvis-tts-{uuid.uuid4().hex}.wav")
+
+            threading.Thread(target=self._run, name="tts-worker", daemon=True).start()
+            self.pid = os.getpid()
+
+    def after_fork(self):
+        """Called in forked worker processes: the engine starts in the worker, not in the master."""
+        self.start_lock = threading.Lock()
+        self.start()
+
+    def wait_ready(self, timeout=None):
+        """Starts the engine if needed and waits until the voice is known; returns whether it is."""
+        self.start()
+        return self.ready.wait(timeout=timeout)
+
+    def submit(self, text):
+        """Queues text for synthesis; the Future resolves to WAV bytes."""
+        self.start()
+        future = Future()
+        self.jobs.put((future, text))
+        return future
+
+    def synthesize(self, text, timeout=30):
+        return self.submit(text).result(timeout=timeout)
+
+    def _start_engine(self):
+        # Imported on the worker thread so that it never delays server startup
+        import pyttsx3
+        engine = pyttsx3.init()
+        # Try to find a decent voice (David/Zira on Windows, Google on other platforms)
+        for voice in engine.getProperty('voices'):
+            if any(name in voice.name.lower() for name in self.preferred_voices):
+                engine.setProperty('voice', voice.id)
+                break
+        if self.rate:
+            engine.setProperty('rate', self.rate)
+        self.voice_id = engine.getProperty('voice')
+        self.rate = engine.getProperty('rate')
+        return engine
+
+    def _run(self):
+        try:
+            engine = self._start_engine()
+        except Exception as e:
+            print(f"TTS Error: could not start engine: {e}")
+            self.error = e
+            engine = None
+        self.ready.set()
+
+        while True:
+            future, text = self.jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if engine is None:
+                future.set_exception(RuntimeError(f"TTS engine unavailable: {self.error}"))
+                continue
+            try:
+                engine.save_to_file(text, self.scratch_path)
+                engine.runAndWait()
+                with open(self.scratch_path, "rb") as f:
+                    future.set_result(f.read())
+            except Exception as e:
+                future.set_exception(e)
+